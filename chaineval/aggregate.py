@@ -1,132 +1,559 @@
-import os
+import argparse
+import gzip
+import hashlib
+import importlib.util
 import json
-from tqdm import tqdm
-import numpy as np
+import os
 import pickle
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from evaluate_predictions import RESULT_METRIC_FIELDS
+from tdigest import TDigest
+
+DEFAULT_EVALS_DIR = Path("../evals/")
+MEAN_SDV_RESULTS_FILE = "mean_sdv_results.txt"
+SUMMARY_SUFFIX = ".summary.json.gz"
+SUMMARY_FORMAT = 2
+SUMMARY_DIGEST_BATCH = 1024
+MANIFEST_FILE = "aggregate_manifest.json"
+MANIFEST_FORMAT = 3
+LONG_TABLE_FILE = "results_long.parquet"
+ROWS_DIR = "rows"
+ROWS_BATCH = 8192
+ROW_RECORD_FIELDS = ("seed", "id", "level", "topic", "subtopic", "model")
+PICKLE_FILES = {
+    "topic": "topic_wise_results.pkl",
+    "subtopic": "subtopic_wise_results.pkl",
+    "level": "level_wise_results.pkl",
+}
+
+# Column order of every table: a (len(METRIC_COLUMNS), 2) array of [mean, std] rows. A
+# metric family the run did not score (evaluate_predictions.py --metrics) is NaN.
+METRIC_COLUMNS = ("final_answer_match", "recall", "precision", "step_f1", "rouge2", "rougeL", "rougeLsum", "bertscore")
+GROUPINGS = ("overall", "topic", "subtopic", "level")
+
+
+class RunningStats:
+    # Welford accumulator over rows of METRIC_COLUMNS values: per-column count, mean and
+    # the sum of squared deviations (M2), skipping NaN values; std is the population std,
+    # as np.std.
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, width: int = len(METRIC_COLUMNS)) -> None:
+        self.count = np.zeros(width, dtype=np.int64)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+
+    def add(self, values: np.ndarray) -> None:
+        present = ~np.isnan(values)
+        if present.all():
+            self.count += 1
+            delta = values - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (values - self.mean)
+            return
+        self.count[present] += 1
+        delta = values[present] - self.mean[present]
+        self.mean[present] += delta / self.count[present]
+        self.m2[present] += delta * (values[present] - self.mean[present])
+
+    def merge(self, other: "RunningStats") -> None:
+        # Chan et al. pairwise update, so accumulators of separate passes combine.
+        merged = other.count > 0
+        count = self.count + other.count
+        delta = other.mean[merged] - self.mean[merged]
+        self.mean[merged] += delta * (other.count[merged] / count[merged])
+        self.m2[merged] = (
+            self.m2[merged] + other.m2[merged] + delta * delta * (self.count[merged] * other.count[merged] / count[merged])
+        )
+        self.count = count
+
+    def table(self) -> np.ndarray:
+        # (width, 2) [mean, std] rows; NaN for columns that never had a value.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.mean, np.nan)
+            return np.stack([mean, np.sqrt(self.m2 / self.count)], axis=1)
+
+
+# (instance key, topic, subtopic, level, has id): the finest grouping any table needs. The
+# tables average per-instance means and stds, so accumulators are kept per cell; memory
+# grows with instances, not rows.
+Cell = Tuple[str, Any, Any, str, bool]
+Tables = Dict[str, Dict[Any, np.ndarray]]
+GroupSizes = Dict[str, Dict[Any, int]]  # grouping -> group -> number of instances
+
+
+def row_step_f1(row: Dict[str, Any]) -> Optional[float]:
+    recall, precision = row.get("recall"), row.get("precision")
+    if recall is None or precision is None:
+        return None
+    return 2 * (recall * precision) / (recall + precision + 0.0001)
+
+
+def row_values(row: Dict[str, Any], columns: Tuple[str, ...] = METRIC_COLUMNS) -> Optional[np.ndarray]:
+    # None skips a row whose step metrics were scored but came out None. Fields the run did
+    # not write (metric families left out with --metrics) are NaN rather than an error.
+    if any(name in row and row[name] is None for name in ("recall", "precision", "final_answer_match")):
+        return None
+    step_f1 = row_step_f1(row)
+    return np.array([step_f1 if name == "step_f1" else row.get(name) for name in columns], dtype=float)
+
+
+def row_cell(row: Dict[str, Any]) -> Cell:
+    return (
+        f"{row['id']}_{row['topic']}_{row['subtopic']}",
+        row["topic"],
+        row["subtopic"],
+        row["level"].lower(),
+        row["id"] is not None,
+    )
+
+
+def cell_group(cell: Cell, grouping: str) -> Any:
+    # None leaves the cell out of the grouping (the overall table skips rows without an id).
+    _, topic, subtopic, level, has_id = cell
+    if grouping == "overall":
+        return "overall" if has_id else None
+    return dict(topic=topic, subtopic=subtopic, level=level)[grouping]
+
+
+class Summary:
+    # Mergeable aggregate of one or more evals files: a Welford accumulator per cell and a
+    # t-digest per (grouping, group, metric) for quantiles. Summaries of disjoint row sets
+    # (shards, machines) merge into the summary of their union without the raw rows.
+    def __init__(self) -> None:
+        self.cells: Dict[Cell, RunningStats] = {}
+        self.digests: Dict[Tuple[str, Any], List[TDigest]] = {}
+        self._pending: Dict[Tuple[str, Any], List[np.ndarray]] = {}  # rows not yet in the digests
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        values = row_values(row)
+        if values is None:
+            return
+        cell = row_cell(row)
+        if cell not in self.cells:
+            self.cells[cell] = RunningStats()
+        self.cells[cell].add(values)
+        for grouping in GROUPINGS:
+            group = cell_group(cell, grouping)
+            if group is None:
+                continue
+            self._pending.setdefault((grouping, group), []).append(values)
+            if len(self._pending[grouping, group]) >= SUMMARY_DIGEST_BATCH:
+                self._flush(grouping, group)
+
+    def _flush(self, grouping: str, group: Any) -> None:
+        # Digest buffered rows one metric column at a time.
+        rows = np.array(self._pending.pop((grouping, group)))
+        if (grouping, group) not in self.digests:
+            self.digests[grouping, group] = [TDigest() for _ in METRIC_COLUMNS]
+        for digest, column in zip(self.digests[grouping, group], rows.T):
+            digest.add_many(column)
+
+    def flush(self) -> None:
+        for grouping, group in list(self._pending):
+            self._flush(grouping, group)
+
+    def merge(self, other: "Summary") -> None:
+        self.flush()
+        other.flush()
+        for cell, stats in other.cells.items():
+            if cell not in self.cells:
+                self.cells[cell] = RunningStats()
+            self.cells[cell].merge(stats)
+        for group, digests in other.digests.items():
+            if group not in self.digests:
+                self.digests[group] = [TDigest() for _ in METRIC_COLUMNS]
+            for digest, other_digest in zip(self.digests[group], digests):
+                digest.merge(other_digest)
+
+    def _instances(self, grouping: str) -> Dict[Any, Dict[str, List[RunningStats]]]:
+        # group -> instance key -> accumulators of that instance's cells
+        groups: Dict[Any, Dict[str, List[RunningStats]]] = {}
+        for cell, stats in self.cells.items():
+            group = cell_group(cell, grouping)
+            if group is not None:
+                groups.setdefault(group, {}).setdefault(cell[0], []).append(stats)
+        return groups
+
+    def tables(self) -> Tables:
+        return {
+            grouping: {
+                group: group_table([merge_stats(parts) for parts in instances.values()])
+                for group, instances in self._instances(grouping).items()
+            }
+            for grouping in GROUPINGS
+        }
+
+    def group_sizes(self) -> GroupSizes:
+        return {
+            grouping: {group: len(instances) for group, instances in self._instances(grouping).items()}
+            for grouping in GROUPINGS
+        }
+
+    def quantiles(self, qs: List[float]) -> Dict[str, Dict[Any, np.ndarray]]:
+        # grouping -> group -> (len(METRIC_COLUMNS), len(qs)) array
+        self.flush()
+        result: Dict[str, Dict[Any, np.ndarray]] = {grouping: {} for grouping in GROUPINGS}
+        for (grouping, group), digests in self.digests.items():
+            result[grouping][group] = np.array([[digest.quantile(q) for q in qs] for digest in digests])
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.flush()
+        return dict(
+            format=SUMMARY_FORMAT,
+            metrics=list(METRIC_COLUMNS),
+            cells=[
+                [*cell, stats.count.tolist(), stats.mean.tolist(), stats.m2.tolist()]
+                for cell, stats in self.cells.items()
+            ],
+            digests=[
+                [grouping, group, [digest.to_dict() for digest in digests]]
+                for (grouping, group), digests in self.digests.items()
+            ],
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Summary":
+        if data.get("format") != SUMMARY_FORMAT or data.get("metrics") != list(METRIC_COLUMNS):
+            raise ValueError(f"Unsupported summary format {data.get('format')} / metrics {data.get('metrics')}")
+        summary = cls()
+        for key, topic, subtopic, level, has_id, count, mean, m2 in data["cells"]:
+            stats = RunningStats()
+            stats.count = np.asarray(count, dtype=np.int64)
+            stats.mean, stats.m2 = np.asarray(mean, dtype=float), np.asarray(m2, dtype=float)
+            summary.cells[key, topic, subtopic, level, has_id] = stats
+        for grouping, group, digests in data["digests"]:
+            summary.digests[grouping, group] = [TDigest.from_dict(digest) for digest in digests]
+        return summary
+
+
+def summarize_file(path: Path, rows: Optional["RowTableWriter"] = None) -> Summary:
+    # One pass over an evals file, feeding every grouping (and the per-row table) at once.
+    summary = Summary()
+    with path.open("r") as handle:
+        for line in handle:
+            row = json.loads(line)
+            summary.add_row(row)
+            if rows is not None:
+                rows.add(row)
+    return summary
+
+
+def have_pyarrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def row_table_columns() -> List[Tuple[str, Any]]:
+    # (column, converter) of the per-row tables, in schema order. The schema is fixed rather
+    # than inferred, so a field that is null or int-valued early in a file and populated or
+    # float-valued later lands in the same column type.
+    columns: List[Tuple[str, Any]] = [(name, str) for name in ROW_RECORD_FIELDS + ("model_file",)]
+    for name in RESULT_METRIC_FIELDS + ("step_f1",):
+        columns.append((name, int if name == "final_answer_match" else float))
+    return columns
+
+
+def row_table_schema() -> Any:
+    import pyarrow as pa
+
+    types = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+    return pa.schema([(name, types[convert]) for name, convert in row_table_columns()])
+
+
+class RowTableWriter:
+    # Streams the rows of one evals file into a Parquet file in ROWS_BATCH-row groups: the
+    # record fields, the metric fields, model_file and step_f1 (row_table_schema()).
+    def __init__(self, path: Path, model_file: str) -> None:
+        self.path = path
+        self.partial = path.with_name(path.name + ".tmp")
+        self.model_file = model_file
+        self.columns = row_table_columns()
+        self.batch: Dict[str, List[Any]] = {name: [] for name, _ in self.columns}
+        self.size = 0
+        self.writer: Any = None
+
+    def add(self, row: Dict[str, Any]) -> None:
+        row = dict(row, model_file=self.model_file, step_f1=row_step_f1(row))
+        for name, convert in self.columns:
+            value = row.get(name)
+            self.batch[name].append(None if value is None else convert(value))
+        self.size += 1
+        if self.size >= ROWS_BATCH:
+            self._write_batch()
+
+    def _write_batch(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.partial, row_table_schema())
+        self.writer.write_table(pa.table(self.batch, schema=self.writer.schema))
+        self.batch = {name: [] for name, _ in self.columns}
+        self.size = 0
+
+    def close(self) -> None:
+        if self.size or self.writer is None:
+            self._write_batch()
+        self.writer.close()
+        os.replace(self.partial, self.path)
+
+    def discard(self) -> None:
+        # Drops a partially written table, e.g. after a failed read.
+        if self.writer is not None:
+            self.writer.close()
+        self.partial.unlink(missing_ok=True)
+
+
+def rows_table_path(summary_dir: Path, model_file: str) -> Path:
+    return summary_dir / ROWS_DIR / f"{Path(model_file).stem}.parquet"
+
+
+def summary_path(summary_dir: Path, model_file: str) -> Path:
+    return summary_dir / f"{Path(model_file).stem}{SUMMARY_SUFFIX}"
+
+
+def summary_model_file(path: Path) -> str:
+    return path.name[: -len(SUMMARY_SUFFIX)] + ".jsonl"
+
+
+def write_summary(summary: Summary, path: Path) -> None:
+    partial = path.with_name(path.name + ".tmp")
+    with partial.open("wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as sink:
+            json.dump(summary.to_dict(), sink)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+
+def read_summary(path: Path) -> Summary:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return Summary.from_dict(json.load(handle))
+
+
+def file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tables_to_json(tables: Tables) -> Dict[str, List[List[Any]]]:
+    return {grouping: [[group, table.tolist()] for group, table in groups.items()] for grouping, groups in tables.items()}
+
+
+def tables_from_json(data: Dict[str, List[List[Any]]]) -> Tables:
+    return {grouping: {group: np.array(table, dtype=float) for group, table in groups} for grouping, groups in data.items()}
+
+
+def sizes_to_json(sizes: GroupSizes) -> Dict[str, List[List[Any]]]:
+    return {grouping: [[group, n] for group, n in groups.items()] for grouping, groups in sizes.items()}
+
+
+def sizes_from_json(data: Dict[str, List[List[Any]]]) -> GroupSizes:
+    return {grouping: {group: n for group, n in groups} for grouping, groups in data.items()}
+
+
+# The manifest maps each evals file name to the size, mtime and sha1 it had when it was
+# summarized, plus its tables; unchanged files are served from it without being read.
+def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("format") != MANIFEST_FORMAT or manifest.get("metrics") != list(METRIC_COLUMNS):
+        return {}  # written by an incompatible version; everything is re-aggregated
+    return manifest["files"]
+
+
+def save_manifest(path: Path, files: Dict[str, Dict[str, Any]]) -> None:
+    partial = path.with_name(path.name + ".tmp")
+    with partial.open("w", encoding="utf-8") as sink:
+        json.dump(dict(format=MANIFEST_FORMAT, metrics=list(METRIC_COLUMNS), files=files), sink)
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(partial, path)
+
+
+def unchanged_entry(path: Path, entry: Optional[Dict[str, Any]], outputs: List[Path]) -> Optional[Dict[str, Any]]:
+    # The manifest entry if `path` still has the content it was summarized from and its
+    # per-file `outputs` exist, else None. A differing mtime alone (copy, touch,
+    # checkout) falls back to comparing hashes.
+    if entry is None or not all(output.exists() for output in outputs):
+        return None
+    stat = path.stat()
+    if entry["size"] != stat.st_size:
+        return None
+    if entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry
+    if entry["sha1"] != file_sha1(path):
+        return None
+    return dict(entry, mtime_ns=stat.st_mtime_ns)
+
+
+def aggregate_file(path: Path, summary_file: Path, rows_file: Optional[Path] = None) -> Dict[str, Any]:
+    stat = path.stat()  # taken before reading, so a concurrent append shows up as a change next run
+    rows = RowTableWriter(rows_file, path.name) if rows_file is not None else None
+    try:
+        summary = summarize_file(path, rows)
+        if rows is not None:
+            rows.close()
+    except BaseException:
+        if rows is not None:
+            rows.discard()
+        raise
+    write_summary(summary, summary_file)
+    return dict(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha1=file_sha1(path),
+        summary=summary_file.name,
+        tables=tables_to_json(summary.tables()),
+        sizes=sizes_to_json(summary.group_sizes()),
+    )
+
+
+def merge_stats(parts: List[RunningStats]) -> RunningStats:
+    if len(parts) == 1:
+        return parts[0]
+    merged = RunningStats()
+    for stats in parts:
+        merged.merge(stats)
+    return merged
+
+
+def group_table(instances: List[RunningStats]) -> np.ndarray:
+    # Mean over the instances that have each metric; NaN if none has it.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(np.array([stats.table() for stats in instances]), axis=0)
+
+
+def format_results_line(model_file: str, table: np.ndarray) -> str:
+    cells = [
+        "-" if m == "nan" else f"${m}_{'{' + sd + '}'}$"
+        for m, sd in np.array(np.around(table, decimals=4), dtype="str")
+    ]
+    return model_file.split(".jsonl")[0].replace("_", "-") + " & " + " & ".join(cells) + "\\\\\n"
+
+
+def write_long_table(path: Path, tables: Dict[str, Tables], sizes: Dict[str, GroupSizes]) -> None:
+    # One row per (model, grouping, group, metric) with the table's mean and std and the
+    # number of instances n behind them.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns: Dict[str, List[Any]] = {name: [] for name in ("model", "grouping", "group", "metric", "mean", "std", "n")}
+    for model_file, model_tables in tables.items():
+        for grouping, groups in model_tables.items():
+            for group, table in groups.items():
+                for metric, (mean, std) in zip(METRIC_COLUMNS, table.tolist()):
+                    if np.isnan(mean):
+                        continue  # metric not scored for this model
+                    columns["model"].append(model_file.split(".jsonl")[0])
+                    columns["grouping"].append(grouping)
+                    columns["group"].append(None if group is None else str(group))
+                    columns["metric"].append(metric)
+                    columns["mean"].append(mean)
+                    columns["std"].append(std)
+                    columns["n"].append(sizes[model_file][grouping][group])
+    schema = pa.schema(
+        [
+            ("model", pa.string()),
+            ("grouping", pa.string()),
+            ("group", pa.string()),
+            ("metric", pa.string()),
+            ("mean", pa.float64()),
+            ("std", pa.float64()),
+            ("n", pa.int64()),
+        ]
+    )
+    partial = path.with_name(path.name + ".tmp")
+    pq.write_table(pa.table(columns, schema=schema), partial)
+    os.replace(partial, path)
+
+
+def write_outputs(evals_dir: Path, tables: Dict[str, Tables], sizes: Optional[Dict[str, GroupSizes]] = None) -> None:
+    # The long-format Parquet table is written next to the pickles when pyarrow is installed.
+    with (evals_dir / MEAN_SDV_RESULTS_FILE).open("w") as results_file:
+        for model_file, model_tables in tables.items():
+            results_file.write(format_results_line(model_file, model_tables["overall"].get("overall", np.array([]))))
+    for grouping, file_name in PICKLE_FILES.items():
+        with (evals_dir / file_name).open("wb") as handle:
+            pickle.dump({model_file: model_tables[grouping] for model_file, model_tables in tables.items()}, handle)
+    if sizes is not None and have_pyarrow():
+        write_long_table(evals_dir / LONG_TABLE_FILE, tables, sizes)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Aggregate ChainEval evals files into leaderboard tables.")
+    parser.add_argument(
+        "--evals-dir",
+        type=Path,
+        default=DEFAULT_EVALS_DIR,
+        help="Directory of per-model evals .jsonl files; the tables are written next to them.",
+    )
+    parser.add_argument(
+        "--summary-dir",
+        type=Path,
+        default=None,
+        help=f"Where the mergeable <model>{SUMMARY_SUFFIX} files go (see merge_summaries.py); defaults to --evals-dir.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help=f"Ignore {MANIFEST_FILE} and re-aggregate every evals file.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    summary_dir = args.summary_dir or args.evals_dir
+    summary_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = summary_dir / MANIFEST_FILE
+    previous = {} if args.rebuild else load_manifest(manifest_path)
+    columnar = have_pyarrow()
+    if not columnar:
+        warnings.warn(f"pyarrow is not installed; skipping {LONG_TABLE_FILE} and the {ROWS_DIR}/ Parquet tables")
+
+    def outputs(model_file: str) -> List[Path]:
+        paths = [summary_path(summary_dir, model_file)]
+        return paths + [rows_table_path(summary_dir, model_file)] if columnar else paths
+
+    files: Dict[str, Dict[str, Any]] = {}
+    stale = []
+    for model_file in [name for name in os.listdir(args.evals_dir) if name.endswith(".jsonl")]:
+        entry = unchanged_entry(args.evals_dir / model_file, previous.get(model_file), outputs(model_file))
+        if entry is None:
+            stale.append(model_file)
+        files[model_file] = entry
+    for model_file in tqdm(stale, desc="aggregate"):
+        files[model_file] = aggregate_file(
+            args.evals_dir / model_file,
+            summary_path(summary_dir, model_file),
+            rows_table_path(summary_dir, model_file) if columnar else None,
+        )
+        # Saved per file, so an interrupted run keeps the files it already finished.
+        save_manifest(manifest_path, {name: entry for name, entry in files.items() if entry is not None})
+    if files != previous:
+        save_manifest(manifest_path, files)
+
+    write_outputs(
+        args.evals_dir,
+        {model_file: tables_from_json(entry["tables"]) for model_file, entry in files.items()},
+        {model_file: sizes_from_json(entry["sizes"]) for model_file, entry in files.items()},
+    )
+    print(f"re-aggregated {len(stale)} of {len(files)} evals file(s)")
+
 
-evals_base_dir = '../evals/'
-
-mean_sdv_results_file = open(f'{evals_base_dir}mean_sdv_results.txt', 'w')
-
-topic_wise_results = {}
-subtopic_wise_results = {}
-level_wise_results = {}
-
-for model_file in os.listdir(evals_base_dir):
-    if model_file.endswith('.jsonl'):
-        
-        topic_wise_results[model_file] = {}
-        subtopic_wise_results[model_file] = {}
-        level_wise_results[model_file] = {}
-
-        with open(f'{evals_base_dir}{model_file}', 'r') as f_pred:
-
-            mean_sdv_metric_vals = {}
-            
-            for line in f_pred:
-                
-                json_line = json.loads(line)
-                
-                recall, precision, final_answer_match, rouge2, rougeL, rougeLsum, bertscore = json_line['recall'], json_line['precision'], json_line['final_answer_match'], json_line['rouge2'], json_line['rougeL'], json_line['rougeLsum'], json_line['bertscore']
-                if recall is None or precision is None or final_answer_match is None:
-                    continue
-                step_f1 = 2 * (recall * precision) / (recall + precision + 0.0001)
-                
-                # Collect overall metric values
-                if json_line['id'] is not None:
-                    mean_sdv_metric_vals[f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = mean_sdv_metric_vals.get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-                
-                # Collect topic wise results for each model
-                topic_wise_results[model_file][json_line['topic']] = topic_wise_results[model_file].get(json_line['topic'], {})
-                topic_wise_results[model_file][json_line['topic']][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = topic_wise_results[model_file][json_line['topic']].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-                # Collect subtopic wise results for each model
-                subtopic_wise_results[model_file][json_line['subtopic']] = subtopic_wise_results[model_file].get(json_line['subtopic'], {})
-                subtopic_wise_results[model_file][json_line['subtopic']][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = subtopic_wise_results[model_file][json_line['subtopic']].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-                # Collect level wise results
-                level_wise_results[model_file][json_line['level'].lower()] = level_wise_results[model_file].get(json_line['level'].lower(), {})
-                level_wise_results[model_file][json_line['level'].lower()][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = level_wise_results[model_file][json_line['level'].lower()].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-            # Calculate mean and standard deviation for each metric on the overall results
-            for key, vals in mean_sdv_metric_vals.items():
-                mean_sdv_metric_vals[key] = [[m,sd] for m,sd in zip(np.mean(vals, axis=0), np.std(vals, axis=0))]
-            
-            # Write the mean and standard deviation results to the file
-            mean_sdv_metric_vals = np.array(list(mean_sdv_metric_vals.values()))
-            mean_sdv_results_file.write(model_file.split('.jsonl')[0].replace('_','-') + " & " +  " & ".join([f"${m}_{'{' + sd + '}'}$" for m,sd in np.array(np.around(np.mean(mean_sdv_metric_vals, axis=0), decimals=4), dtype='str')]) + '\\\\\n')
-
-
-
-# for model_file in os.listdir(f'{evals_base_dir}reasoning/):
-#     if model_file.endswith('.jsonl'):
-        
-#         topic_wise_results[model_file] = {}
-#         subtopic_wise_results[model_file] = {}
-#         level_wise_results[model_file] = {}
-
-#         with open(f'{evals_base_dir}reasoning/{model_file}', 'r') as f_pred:
-
-#             mean_sdv_metric_vals = {}
-            
-#             for line in f_pred:
-                
-#                 json_line = json.loads(line)
-                
-#                 recall, precision, final_answer_match, rouge2, rougeL, rougeLsum, bertscore = json_line['recall'], json_line['precision'], json_line['final_answer_match'], json_line['rouge2'], json_line['rougeL'], json_line['rougeLsum'], json_line['bertscore']
-#                 if recall is None or precision is None or final_answer_match is None:
-#                     continue
-#                 step_f1 = 2 * (recall * precision) / (recall + precision + 0.0001)
-                
-#                 # Collect overall metric values
-#                 if json_line['id'] is not None:
-#                     mean_sdv_metric_vals[f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = mean_sdv_metric_vals.get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-                
-#                 # Collect topic wise results for each model
-#                 topic_wise_results[model_file][json_line['topic']] = topic_wise_results[model_file].get(json_line['topic'], {})
-#                 topic_wise_results[model_file][json_line['topic']][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = topic_wise_results[model_file][json_line['topic']].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-#                 # Collect subtopic wise results for each model
-#                 subtopic_wise_results[model_file][json_line['subtopic']] = subtopic_wise_results[model_file].get(json_line['subtopic'], {})
-#                 subtopic_wise_results[model_file][json_line['subtopic']][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = subtopic_wise_results[model_file][json_line['subtopic']].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-#                 # Collect level wise results
-#                 level_wise_results[model_file][json_line['level'].lower()] = level_wise_results[model_file].get(json_line['level'].lower(), {})
-#                 level_wise_results[model_file][json_line['level'].lower()][f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}"] = level_wise_results[model_file][json_line['level'].lower()].get(f"{json_line['id']}_{json_line['topic']}_{json_line['subtopic']}", []) + [[final_answer_match, recall, precision, step_f1, rouge2, rougeL, rougeLsum, bertscore]]
-
-#             # Calculate mean and standard deviation for each metric on the overall results
-#             for key, vals in mean_sdv_metric_vals.items():
-#                 mean_sdv_metric_vals[key] = [[m,sd] for m,sd in zip(np.mean(vals, axis=0), np.std(vals, axis=0))]
-            
-#             # Write the mean and standard deviation results to the file
-#             mean_sdv_metric_vals = np.array(list(mean_sdv_metric_vals.values()))
-#             mean_sdv_results_file.write(model_file.split('.jsonl')[0].replace('_','-') + " & " +  " & ".join([f"${m}_{'{' + sd + '}'}$" for m,sd in np.array(np.around(np.mean(mean_sdv_metric_vals, axis=0), decimals=4), dtype='str')]) + '\\\\\n')
-
-# Calculate mean and standard deviation for each metric on the topic wise results
-for model_file in topic_wise_results:
-    for topic in topic_wise_results[model_file]:
-        for key,vals in topic_wise_results[model_file][topic].items():
-            topic_wise_results[model_file][topic][key] = [[m,sd] for m,sd in zip(np.mean(vals, axis=0), np.std(vals, axis=0))]
-
-        topic_wise_results[model_file][topic] = np.mean(np.array(list(topic_wise_results[model_file][topic].values())), axis=0)
-
-# Calculate mean and standard deviation for each metric on the subtopic wise results
-for model_file in subtopic_wise_results:
-    for subtopic in subtopic_wise_results[model_file]:
-        for key,vals in subtopic_wise_results[model_file][subtopic].items():
-            subtopic_wise_results[model_file][subtopic][key] = [[m,sd] for m,sd in zip(np.mean(vals, axis=0), np.std(vals, axis=0))]
-
-        subtopic_wise_results[model_file][subtopic] = np.mean(np.array(list(subtopic_wise_results[model_file][subtopic].values())), axis=0)
-
-# Calculate mean and standard deviation for each metric on the level wise results
-for model_file in level_wise_results:
-    for level in level_wise_results[model_file]:
-        for key,vals in level_wise_results[model_file][level].items():
-            level_wise_results[model_file][level][key] = [[m,sd] for m,sd in zip(np.mean(vals, axis=0), np.std(vals, axis=0))]
-
-        level_wise_results[model_file][level] = np.mean(np.array(list(level_wise_results[model_file][level].values())), axis=0)
-
-# Dump all topic wise, subtopic wise, and level wise results to pickle files
-pickle.dump(topic_wise_results, open(f'{evals_base_dir}topic_wise_results.pkl', 'wb'))
-pickle.dump(subtopic_wise_results, open(f'{evals_base_dir}subtopic_wise_results.pkl', 'wb'))
-pickle.dump(level_wise_results, open(f'{evals_base_dir}level_wise_results.pkl', 'wb'))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from evaluate_predictions import (
+    BERT_BATCH_SIZE,
+    BERT_TOKEN_BUDGET,
+    DEFAULT_INPUT_PATH,
+    compute_bert_scores,
+    open_reference_cache,
+    read_jsonl,
+    resolve_inputs,
+)
+
+
+# Measures how far the fast BERTScore paths (--bert-int8, --bert-num-layers) drift from
+# the fp32 default on real prediction files, to decide whether they are acceptable for
+# leaderboard numbers. Each setting is scored on the same pairs; timings include batching.
+# With --check-paths it instead compares the batched fp32 path and the reference-cache
+# path (--bert-reference-cache, cold then warm) with the single-pair path
+# (--bert-single-pair), which both must reproduce.
+Setting = Tuple[str, Optional[int], bool]
+
+
+def collect_pairs(input_paths: List[Path], limit: Optional[int]) -> List[Tuple[str, str]]:
+    pairs = []
+    for input_path in input_paths:
+        for row in read_jsonl(input_path):
+            gold, pred = row.get("solution"), row.get("model_generation")
+            # Other rows score 0.0 under every setting and would only inflate the correlation.
+            if isinstance(gold, str) and isinstance(pred, str) and gold.strip() and pred.strip():
+                pairs.append((gold, pred))
+                if limit is not None and len(pairs) >= limit:
+                    return pairs
+    return pairs
+
+
+def calibration_settings(num_layers: List[int]) -> List[Setting]:
+    settings: List[Setting] = [("int8", None, True)]
+    for layers in num_layers:
+        settings += [(f"layers={layers}", layers, False), (f"layers={layers}+int8", layers, True)]
+    return settings
+
+
+def score_setting(
+    pairs: List[Tuple[str, str]],
+    num_layers: Optional[int],
+    int8: bool,
+    batch_size: int,
+    token_budget: int,
+    **kwargs: Any,
+) -> Tuple[np.ndarray, float]:
+    # Load (and quantize) the model before timing.
+    compute_bert_scores(pairs[:1], batch_size=batch_size, token_budget=token_budget, num_layers=num_layers, int8=int8)
+    start = time.perf_counter()
+    scores = compute_bert_scores(
+        pairs, batch_size=batch_size, token_budget=token_budget, num_layers=num_layers, int8=int8, **kwargs
+    )
+    return np.asarray(scores, dtype=float), time.perf_counter() - start
+
+
+def ranks(values: np.ndarray) -> np.ndarray:
+    order = np.argsort(values, kind="stable")
+    result = np.empty(len(values), dtype=float)
+    result[order] = np.arange(len(values))
+    return result
+
+
+def compare_scores(reference: np.ndarray, scores: np.ndarray) -> Dict[str, float]:
+    deviation = np.abs(scores - reference)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pearson = float(np.corrcoef(reference, scores)[0, 1]) if len(reference) > 1 else float("nan")
+        spearman = float(np.corrcoef(ranks(reference), ranks(scores))[0, 1]) if len(reference) > 1 else float("nan")
+    return dict(
+        pearson=pearson,
+        spearman=spearman,
+        max_abs_diff=float(deviation.max()) if len(deviation) else 0.0,
+        mean_abs_diff=float(deviation.mean()) if len(deviation) else 0.0,
+    )
+
+
+def calibration_report(
+    pairs: List[Tuple[str, str]],
+    settings: List[Setting],
+    batch_size: int = BERT_BATCH_SIZE,
+    token_budget: int = BERT_TOKEN_BUDGET,
+) -> List[Dict[str, float]]:
+    reference, reference_seconds = score_setting(pairs, None, False, batch_size, token_budget)
+    report = [dict(setting="fp32", seconds=reference_seconds, speedup=1.0, **compare_scores(reference, reference))]
+    for label, num_layers, int8 in settings:
+        scores, seconds = score_setting(pairs, num_layers, int8, batch_size, token_budget)
+        report.append(
+            dict(
+                setting=label,
+                seconds=seconds,
+                speedup=reference_seconds / max(seconds, 1e-12),
+                **compare_scores(reference, scores),
+            )
+        )
+    return report
+
+
+def path_report(
+    pairs: List[Tuple[str, str]], batch_size: int = BERT_BATCH_SIZE, token_budget: int = BERT_TOKEN_BUDGET
+) -> List[Dict[str, float]]:
+    reference, reference_seconds = score_setting(pairs, None, False, batch_size, token_budget, single_pair=True)
+    report = [dict(setting="single-pair", seconds=reference_seconds, speedup=1.0, **compare_scores(reference, reference))]
+    with tempfile.TemporaryDirectory() as cache_root:
+        cache = open_reference_cache(Path(cache_root))
+        paths = [("batched", {}), ("cached-cold", dict(reference_cache=cache)), ("cached-warm", dict(reference_cache=cache))]
+        for label, kwargs in paths:
+            scores, seconds = score_setting(pairs, None, False, batch_size, token_budget, **kwargs)
+            report.append(
+                dict(
+                    setting=label,
+                    seconds=seconds,
+                    speedup=reference_seconds / max(seconds, 1e-12),
+                    **compare_scores(reference, scores),
+                )
+            )
+    return report
+
+
+def format_report(report: List[Dict[str, float]]) -> str:
+    lines = [
+        f"{'setting':<16} {'pearson':>8} {'spearman':>9} {'max_abs':>8} {'mean_abs':>9} {'seconds':>8} {'speedup':>8}"
+    ]
+    for entry in report:
+        lines.append(
+            f"{entry['setting']:<16} {entry['pearson']:>8.4f} {entry['spearman']:>9.4f} "
+            f"{entry['max_abs_diff']:>8.2e} {entry['mean_abs_diff']:>9.2e} "
+            f"{entry['seconds']:>8.2f} {entry['speedup']:>7.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Calibrate fast BERTScore settings against fp32.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT_PATH,
+        help="Path to a .jsonl file or directory containing prediction files.",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Only score the first N usable pairs.")
+    parser.add_argument(
+        "--num-layers", type=int, nargs="*", default=[], help="Truncated layer counts to test (with and without int8)."
+    )
+    parser.add_argument(
+        "--check-paths",
+        action="store_true",
+        help="Compare the batched fp32 path against single-pair scoring instead of the fast settings.",
+    )
+    parser.add_argument("--bert-batch-size", type=int, default=BERT_BATCH_SIZE)
+    parser.add_argument("--bert-token-budget", type=int, default=BERT_TOKEN_BUDGET)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    pairs = collect_pairs(resolve_inputs(args.input), args.limit)
+    if args.check_paths:
+        report = path_report(pairs, batch_size=args.bert_batch_size, token_budget=args.bert_token_budget)
+    else:
+        report = calibration_report(
+            pairs,
+            calibration_settings(args.num_layers),
+            batch_size=args.bert_batch_size,
+            token_budget=args.bert_token_budget,
+        )
+    print(f"pairs: {len(pairs)}")
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
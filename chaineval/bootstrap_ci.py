@@ -0,0 +1,224 @@
+import argparse
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from aggregate import DEFAULT_EVALS_DIR, GROUPINGS, METRIC_COLUMNS, Cell, cell_group, row_cell, row_values
+from evaluate_predictions import DTW_METRIC_NAMES, DTW_VARIANTS
+
+# Percentile bootstrap CIs of the leaderboard means (mean over instances of the
+# per-instance mean) for every model, metric and group. A resample draws instances with
+# replacement from the union of all models' instances; its per-instance draw counts C
+# (from one index matrix and a bincount) are shared by every model, metric and group, so
+# a batch of resamples is one gathered matmul per group, C[:, group] @ X[group], against
+# the (instances, models * metrics) value matrix X. Models are processed a few at a time
+# to stay within the memory budget; count batches are seeded by (seed, batch) and are
+# therefore identical across those chunks.
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_BATCH = 500
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_MEMORY_MB = 512
+BOOTSTRAP_GROUPINGS = ("overall", "topic", "level")
+BOOTSTRAP_METRICS = METRIC_COLUMNS + tuple(f"dtw_{name}_{variant}" for variant in DTW_VARIANTS for name in DTW_METRIC_NAMES)
+CI_RESULTS_FILE = "bootstrap_ci.csv"
+
+
+def cell_means(path: Path) -> Dict[Cell, np.ndarray]:
+    # Per-instance means of BOOTSTRAP_METRICS over the rows the tables use; a metric that
+    # is missing from every row of an instance (not scored, e.g. --metrics lite) stays NaN.
+    sums: Dict[Cell, np.ndarray] = {}
+    counts: Dict[Cell, np.ndarray] = {}
+    with path.open("r") as handle:
+        for line in handle:
+            row = json.loads(line)
+            values = row_values(row, BOOTSTRAP_METRICS)
+            if values is None:
+                continue
+            cell = row_cell(row)
+            if cell not in sums:
+                sums[cell] = np.zeros(len(BOOTSTRAP_METRICS))
+                counts[cell] = np.zeros(len(BOOTSTRAP_METRICS))
+            present = ~np.isnan(values)
+            sums[cell][present] += values[present]
+            counts[cell] += present
+    with np.errstate(invalid="ignore"):
+        return {cell: sums[cell] / counts[cell] for cell in sums}
+
+
+def group_indicators(cells: List[Cell], groupings: Tuple[str, ...]) -> Tuple[List[Tuple[str, Any]], np.ndarray]:
+    # (groups, (len(cells), len(groups)) 0/1 membership matrix)
+    index: Dict[Tuple[str, Any], int] = {}
+    members: List[Tuple[int, int]] = []
+    for row, cell in enumerate(cells):
+        for grouping in groupings:
+            group = cell_group(cell, grouping)
+            if group is not None:
+                members.append((row, index.setdefault((grouping, group), len(index))))
+    indicators = np.zeros((len(cells), len(index)))
+    for row, column in members:
+        indicators[row, column] = 1.0
+    return list(index), indicators
+
+
+def resample_counts(seed: int, batch: int, size: int, n_units: int) -> np.ndarray:
+    # (size, n_units) draw counts of `size` resamples of n_units units with replacement.
+    rng = np.random.default_rng([seed, batch])
+    draws = rng.integers(0, n_units, size=(size, n_units)) + (np.arange(size) * n_units)[:, None]
+    return np.bincount(draws.ravel(), minlength=size * n_units).reshape(size, n_units).astype(float)
+
+
+def bootstrap_chunk(
+    values: np.ndarray,
+    indicators: np.ndarray,
+    resamples: int,
+    batch_size: int,
+    seed: int,
+    confidence: float,
+) -> Dict[str, np.ndarray]:
+    # values: (models, units, metrics) per-unit means, NaN where absent. Returns estimate,
+    # ci_low, ci_high and n, each (models, groups, metrics).
+    n_models, n_units, n_metrics = values.shape
+    n_groups = indicators.shape[1]
+    present = ~np.isnan(values)
+    # (units, models * metrics) value sums and presence; absent units add nothing to either.
+    weights = np.where(present, values, 0.0).transpose(1, 0, 2).reshape(n_units, -1)
+    presence = present.transpose(1, 0, 2).reshape(n_units, -1).astype(float)
+    # Metrics present on the same units share a denominator column; multiply each once.
+    distinct, shared = np.unique(presence, axis=1, return_inverse=True)
+    shared = shared.reshape(-1)
+    members = [np.flatnonzero(indicators[:, g]) for g in range(n_groups)]
+
+    replicates = np.empty((resamples, n_groups, weights.shape[1]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for batch, start in enumerate(range(0, resamples, batch_size)):
+            counts = resample_counts(seed, batch, min(batch_size, resamples - start), n_units)
+            for g, rows in enumerate(members):
+                # Only the group's units are gathered, so every grouping costs one pass over the units.
+                drawn = counts[:, rows]
+                replicates[start : start + len(counts), g] = (drawn @ weights[rows]) / (drawn @ distinct[rows])[:, shared]
+        n = np.array([presence[rows].sum(axis=0) for rows in members])
+        estimate = np.array([weights[rows].sum(axis=0) for rows in members]) / n
+        alpha = (1.0 - confidence) / 2.0
+        ci_low, ci_high = np.nanquantile(replicates, [alpha, 1.0 - alpha], axis=0)
+
+    def per_model(array: np.ndarray) -> np.ndarray:
+        return array.reshape(n_groups, n_models, n_metrics).transpose(1, 0, 2)
+
+    return dict(estimate=per_model(estimate), ci_low=per_model(ci_low), ci_high=per_model(ci_high), n=per_model(n))
+
+
+def bootstrap_models(
+    model_cells: Dict[str, Dict[Cell, np.ndarray]],
+    groupings: Tuple[str, ...] = BOOTSTRAP_GROUPINGS,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    batch_size: int = BOOTSTRAP_BATCH,
+    seed: int = BOOTSTRAP_SEED,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+    memory_mb: int = BOOTSTRAP_MEMORY_MB,
+) -> List[Dict[str, Any]]:
+    units: Dict[Cell, None] = {}
+    for cells in model_cells.values():
+        units.update(dict.fromkeys(cells))
+    unit_list = list(units)
+    groups, indicators = group_indicators(unit_list, groupings)
+
+    # Replicates plus the value and presence matrices, in float64, per model.
+    model_bytes = (resamples * len(groups) + 2 * len(unit_list)) * len(BOOTSTRAP_METRICS) * 8
+    per_chunk = max(1, memory_mb * 2**20 // max(1, model_bytes))
+    models = list(model_cells)
+    results: List[Dict[str, Any]] = []
+    for first in tqdm(range(0, len(models), per_chunk), desc="bootstrap"):
+        chunk = models[first : first + per_chunk]
+        missing = np.full(len(BOOTSTRAP_METRICS), np.nan)
+        values = np.array([[model_cells[model].get(cell, missing) for cell in unit_list] for model in chunk])
+        stats = bootstrap_chunk(values, indicators, resamples, batch_size, seed, confidence)
+        for k, model in enumerate(chunk):
+            for g, (grouping, group) in enumerate(groups):
+                for m, metric in enumerate(BOOTSTRAP_METRICS):
+                    if not stats["n"][k, g, m]:
+                        continue
+                    results.append(
+                        dict(
+                            model=model,
+                            grouping=grouping,
+                            group=group,
+                            metric=metric,
+                            estimate=float(stats["estimate"][k, g, m]),
+                            ci_low=float(stats["ci_low"][k, g, m]),
+                            ci_high=float(stats["ci_high"][k, g, m]),
+                            n=int(stats["n"][k, g, m]),
+                        )
+                    )
+    return results
+
+
+def write_results(results: List[Dict[str, Any]], path: Path) -> None:
+    partial = path.with_name(path.name + ".tmp")
+    with partial.open("w", encoding="utf-8", newline="") as sink:
+        writer = csv.DictWriter(sink, fieldnames=["model", "grouping", "group", "metric", "estimate", "ci_low", "ci_high", "n"])
+        writer.writeheader()
+        writer.writerows(results)
+    os.replace(partial, path)
+
+
+def format_overall(results: List[Dict[str, Any]], metrics: Tuple[str, ...]) -> str:
+    lines = [f"{'model':<30} " + " ".join(f"{metric:>26}" for metric in metrics)]
+    by_model: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for entry in results:
+        if entry["grouping"] == "overall":
+            by_model.setdefault(entry["model"], {})[entry["metric"]] = entry
+    for model, entries in by_model.items():
+        cells = []
+        for metric in metrics:
+            entry = entries.get(metric)
+            cells.append(
+                f"{entry['estimate']:.4f} [{entry['ci_low']:.4f}, {entry['ci_high']:.4f}]" if entry else "-"
+            )
+        lines.append(f"{model:<30} " + " ".join(f"{cell:>26}" for cell in cells))
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals for the ChainEval leaderboard.")
+    parser.add_argument("--evals-dir", type=Path, default=DEFAULT_EVALS_DIR, help="Directory of per-model evals .jsonl files.")
+    parser.add_argument(
+        "--output", type=Path, default=None, help=f"CSV of every model/group/metric CI; defaults to <evals-dir>/{CI_RESULTS_FILE}."
+    )
+    parser.add_argument("--groupings", nargs="+", choices=GROUPINGS, default=list(BOOTSTRAP_GROUPINGS))
+    parser.add_argument("--resamples", type=int, default=BOOTSTRAP_RESAMPLES)
+    parser.add_argument("--batch-size", type=int, default=BOOTSTRAP_BATCH, help="Resamples per matmul.")
+    parser.add_argument("--confidence", type=float, default=BOOTSTRAP_CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=BOOTSTRAP_SEED)
+    parser.add_argument(
+        "--memory-mb", type=int, default=BOOTSTRAP_MEMORY_MB, help="Approximate budget for replicates and weights per model chunk."
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    model_files = [name for name in os.listdir(args.evals_dir) if name.endswith(".jsonl")]
+    model_cells = {
+        name.split(".jsonl")[0]: cell_means(args.evals_dir / name) for name in tqdm(model_files, desc="read")
+    }
+    results = bootstrap_models(
+        model_cells,
+        groupings=tuple(args.groupings),
+        resamples=args.resamples,
+        batch_size=args.batch_size,
+        seed=args.seed,
+        confidence=args.confidence,
+        memory_mb=args.memory_mb,
+    )
+    write_results(results, args.output or args.evals_dir / CI_RESULTS_FILE)
+    print(format_overall(results, ("final_answer_match", "step_f1", "rougeL", "bertscore", "dtw_f1_bonus")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from evaluate_predictions import (
+    DEFAULT_INPUT_PATH,
+    extract_final_value,
+    parse_numeric_value,
+    read_jsonl,
+    resolve_inputs,
+    split_trace_text,
+)
+
+
+# Golden test + microbenchmark for the compiled numeric extractor in evaluate_predictions.
+# `legacy_extract_final_value` is a frozen copy of the original regex cascade and is the
+# reference every step of every gold trace must agree with.
+LEGACY_PATTERNS = [
+    r"\**Answer:\**\s*.*?(?:USD|\$)?\s*([\d,]+(?:\.\d{1,2})?)",
+    r"=\s*(?!.*=)(?:USD|\$)?\s*[\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?",
+    r"\d[\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?",
+    r"(?<=\n|\.|:)\s*(answer: |final answer: |final answer is: )?"
+    r"([\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?)",
+]
+
+
+def legacy_extract_final_value(step_text: str) -> Optional[Any]:
+    normalized = re.sub(r"\s+", " ", step_text).strip()
+    for pattern in LEGACY_PATTERNS:
+        matches = list(re.finditer(pattern, normalized.lower()))
+        if matches:
+            candidate = matches[-1].group(0)
+            value = parse_numeric_value(candidate)
+            return value if value is not None else candidate.strip()
+    return None
+
+
+def collect_steps(input_paths: List[Path], fields: List[str]) -> List[str]:
+    steps: List[str] = []
+    for input_path in input_paths:
+        for row in read_jsonl(input_path):
+            for name in fields:
+                steps.extend(split_trace_text(row.get(name)))
+    return steps
+
+
+def same_value(a: Optional[Any], b: Optional[Any]) -> bool:
+    return type(a) is type(b) and (a == b or (a != a and b != b))
+
+
+def golden_check(steps: List[str]) -> List[Tuple[str, Any, Any]]:
+    mismatches = []
+    for step in steps:
+        expected, actual = legacy_extract_final_value(step), extract_final_value(step)
+        if not same_value(expected, actual):
+            mismatches.append((step, expected, actual))
+    return mismatches
+
+
+def benchmark(steps: List[str], repeats: int) -> Dict[str, float]:
+    timings = {}
+    for name, extractor in (("legacy", legacy_extract_final_value), ("current", extract_final_value)):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for step in steps:
+                extractor(step)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check the numeric extractor against the legacy regex cascade.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT_PATH,
+        help="Path to a .jsonl file or directory with gold (and optionally predicted) traces.",
+    )
+    parser.add_argument(
+        "--fields",
+        nargs="+",
+        default=["solution"],
+        help="Row fields holding traces to check, e.g. solution model_generation.",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Benchmark repetitions (best time is reported).")
+    parser.add_argument("--show", type=int, default=10, help="Number of mismatches to print.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    steps = collect_steps(resolve_inputs(args.input), args.fields)
+    mismatches = golden_check(steps)
+    print(f"steps checked: {len(steps)}, mismatches: {len(mismatches)}")
+    for step, expected, actual in mismatches[: args.show]:
+        print(f"  {step!r}\n    legacy={expected!r} current={actual!r}")
+
+    timings = benchmark(steps, args.repeats)
+    per_step = {name: 1e6 * seconds / max(1, len(steps)) for name, seconds in timings.items()}
+    print(
+        f"legacy: {timings['legacy']:.3f}s ({per_step['legacy']:.1f}us/step), "
+        f"current: {timings['current']:.3f}s ({per_step['current']:.1f}us/step), "
+        f"speedup: {timings['legacy'] / max(timings['current'], 1e-12):.1f}x"
+    )
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from evaluate_predictions import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_INPUT_PATH,
+    align_dtw,
+    build_similarity_and_bonus,
+    dtw_metrics_from_scores,
+    dtw_score_matrices,
+    embed_traces,
+    iter_chunks,
+    open_embedding_cache,
+    parse_trace,
+    read_jsonl,
+    resolve_inputs,
+    sakoe_chiba_width,
+)
+
+
+# Compares banded DTW against exact DTW on real prediction files so a safe
+# --dtw-band / --dtw-band-ratio can be picked for the leaderboard runs.
+DEFAULT_BANDS = [2, 4, 8, 16]
+DEFAULT_BAND_RATIOS = [0.1, 0.2, 0.3]
+DTW_METRIC_KEYS = ["precision", "recall", "f1", "avg_path_score", "norm_score"]
+
+
+def band_settings(bands: List[int], band_ratios: List[float]) -> List[Tuple[str, Optional[int], Optional[float]]]:
+    settings = [(f"band={band}", band, None) for band in bands]
+    settings += [(f"ratio={ratio}", None, ratio) for ratio in band_ratios]
+    return settings
+
+
+def new_tally() -> Dict[str, float]:
+    return dict(rows=0, banded=0, path_diff=0, metric_diff=0, max_f1_delta=0.0, sum_norm_delta=0.0)
+
+
+def compare_row(
+    scores: np.ndarray, exact: list, banded: list, n: int, m: int, tally: Dict[str, float]
+) -> None:
+    tally["rows"] += 1
+    tally["banded"] += 1
+    exact_metrics = dtw_metrics_from_scores(scores, exact, n, m)
+    banded_metrics = dtw_metrics_from_scores(scores, banded, n, m)
+    if any(e[0] != b[0] for e, b in zip(exact, banded)):
+        tally["path_diff"] += 1
+    deltas = [
+        abs(exact_metrics[name][key] - banded_metrics[name][key])
+        for name in ("bonus", "gate")
+        for key in DTW_METRIC_KEYS
+    ]
+    if max(deltas) > 1e-9:
+        tally["metric_diff"] += 1
+    tally["max_f1_delta"] = max(
+        tally["max_f1_delta"],
+        *(abs(exact_metrics[name]["f1"] - banded_metrics[name]["f1"]) for name in ("bonus", "gate")),
+    )
+    tally["sum_norm_delta"] += sum(
+        abs(exact_metrics[name]["norm_score"] - banded_metrics[name]["norm_score"]) for name in ("bonus", "gate")
+    ) / 2
+
+
+def band_report(
+    input_paths: List[Path],
+    settings: List[Tuple[str, Optional[int], Optional[float]]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    embedding_cache_dir: Optional[Path] = None,
+) -> Dict[str, Dict[str, float]]:
+    cache = open_embedding_cache(embedding_cache_dir)
+    tallies = {label: new_tally() for label, _, _ in settings}
+
+    for input_path in input_paths:
+        for chunk in tqdm(iter_chunks(read_jsonl(input_path), chunk_size), desc=input_path.name):
+            traces = [(parse_trace(row.get("solution")), parse_trace(row.get("model_generation"))) for row in chunk]
+            traces = [pair for pair in traces if pair[0].steps and pair[1].steps]
+            embed_traces(
+                [trace for pair in traces for trace in pair],
+                cache=cache,
+                cached_traces=[gold_trace for gold_trace, _ in traces],
+            )
+            for gold_trace, pred_trace in traces:
+                n, m = len(gold_trace.steps), len(pred_trace.steps)
+                similarity, bonus = build_similarity_and_bonus(
+                    gold_trace.steps,
+                    pred_trace.steps,
+                    gold_trace.values,
+                    pred_trace.values,
+                    gold_emb=gold_trace.embeddings,
+                    pred_emb=pred_trace.embeddings,
+                )
+                scores = dtw_score_matrices(similarity, bonus)
+                exact = align_dtw(scores)
+                for label, band, ratio in settings:
+                    width = sakoe_chiba_width(n, m, band, ratio)
+                    if width is None:
+                        # Band covers the whole matrix: identical to exact by construction.
+                        tallies[label]["rows"] += 1
+                        continue
+                    compare_row(scores, exact, align_dtw(scores, width), n, m, tallies[label])
+    return tallies
+
+
+def format_report(tallies: Dict[str, Dict[str, float]]) -> str:
+    lines = [
+        f"{'setting':<12} {'rows':>7} {'banded':>7} {'path_diff':>10} {'metric_diff':>12} "
+        f"{'max_df1':>8} {'mean_dnorm':>11}"
+    ]
+    for label, tally in tallies.items():
+        rows = max(1, tally["rows"])
+        lines.append(
+            f"{label:<12} {tally['rows']:>7} {tally['banded']:>7} "
+            f"{tally['path_diff'] / rows:>10.2%} {tally['metric_diff'] / rows:>12.2%} "
+            f"{tally['max_f1_delta']:>8.4f} {tally['sum_norm_delta'] / rows:>11.6f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report how often banded DTW differs from exact DTW.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT_PATH,
+        help="Path to a .jsonl file or directory containing prediction files.",
+    )
+    parser.add_argument("--bands", type=int, nargs="*", default=DEFAULT_BANDS, help="Fixed half-widths to test.")
+    parser.add_argument(
+        "--band-ratios", type=float, nargs="*", default=DEFAULT_BAND_RATIOS, help="Proportional half-widths to test."
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--embedding-cache", type=Path, default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    tallies = band_report(
+        resolve_inputs(args.input),
+        band_settings(args.bands, args.band_ratios),
+        chunk_size=args.chunk_size,
+        embedding_cache_dir=args.embedding_cache,
+    )
+    print(format_report(tallies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Content-addressed store of sentence embeddings shared across evaluation runs.
+# Layout of one cache directory (one per model name + revision):
+#   meta.json     model name, revision, embedding dim and dtype
+#   vectors.f32   row-major float32 matrix, appended to and read via np.memmap
+#   index.tsv     "<key>\t<row>" lines; a key is the hash of (model, revision, text)
+# Rows are appended before their index lines, so the index never points past the data.
+CACHE_DTYPE = np.float32
+
+
+def model_slug(model_name: str, revision: str) -> str:
+    return f"{model_name.replace('/', '--')}@{revision}"
+
+
+def embedding_key(model_name: str, revision: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{revision}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, root: Path, model_name: str, revision: str) -> None:
+        self.model_name = model_name
+        self.revision = revision
+        self.directory = Path(root) / model_slug(model_name, revision)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.directory / "meta.json"
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.tsv"
+        self.lock_path = self.directory / ".lock"
+
+        self.dim: Optional[int] = None
+        if self.meta_path.exists():
+            self.dim = json.loads(self.meta_path.read_text(encoding="utf-8"))["dim"]
+        self._rows: Dict[str, int] = {}
+        self._index_offset = 0
+        self._vectors: Optional[np.memmap] = None
+        self._read_index()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _read_index(self) -> None:
+        if not self.index_path.exists():
+            return
+        with self.index_path.open("rb") as handle:
+            handle.seek(self._index_offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # torn write from an interrupted run
+                self._index_offset += len(line)
+                key, _, row = line.decode("utf-8").rstrip("\n").partition("\t")
+                if row.isdigit():
+                    self._rows.setdefault(key, int(row))
+        self._vectors = None
+
+    def _matrix(self) -> np.memmap:
+        n_rows = max(self._rows.values()) + 1
+        if self._vectors is None or self._vectors.shape[0] < n_rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=CACHE_DTYPE, mode="r", shape=(n_rows, self.dim))
+        return self._vectors
+
+    def lookup(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = {text: embedding_key(self.model_name, self.revision, text) for text in texts}
+        hits = {text: self._rows[key] for text, key in keys.items() if key in self._rows}
+        if not hits:
+            return {}
+        rows = np.asarray(self._matrix()[list(hits.values())])
+        return {text: rows[i] for i, text in enumerate(hits)}
+
+    def add(self, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        with self.lock_path.open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Pick up rows appended by concurrent writers before allocating new ones.
+            self._read_index()
+            pending: Dict[str, np.ndarray] = {}
+            for text, vector in vectors.items():
+                key = embedding_key(self.model_name, self.revision, text)
+                if key not in self._rows:
+                    pending[key] = np.asarray(vector, dtype=CACHE_DTYPE)
+            if not pending:
+                return
+
+            matrix = np.stack(list(pending.values()))
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                self.meta_path.write_text(
+                    json.dumps(
+                        dict(model=self.model_name, revision=self.revision, dim=self.dim, dtype="float32")
+                    ),
+                    encoding="utf-8",
+                )
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {matrix.shape[1]} does not match cache dim {self.dim}")
+
+            row_bytes = self.dim * matrix.itemsize
+            start = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+            with self.vectors_path.open("ab") as handle:
+                handle.truncate(start * row_bytes)  # drop a torn trailing row
+                handle.write(matrix.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            lines: List[str] = []
+            for offset, key in enumerate(pending):
+                self._rows[key] = start + offset
+                lines.append(f"{key}\t{start + offset}\n")
+            with self.index_path.open("a", encoding="utf-8") as handle:
+                handle.truncate(self._index_offset)  # drop a torn trailing line
+                handle.write("".join(lines))
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._index_offset = self.index_path.stat().st_size
+            self._vectors = None
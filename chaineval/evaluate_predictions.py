@@ -1,20 +1,30 @@
 import argparse
+import gc
+import hashlib
 import json
 import math
+import multiprocessing
+import os
+import queue
 import re
+import sys
+import threading
 import warnings
-from collections import Counter
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 import numpy as np
-import torch
-from bert_score import BERTScorer
-from rouge_score import rouge_scorer as rouge_lib
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity as pairwise_cosine
 from tqdm import tqdm
-from transformers import AutoTokenizer
+
+from embedding_cache import EmbeddingCache
+from matrix_store import MatrixWriter, matrix_path
+from reference_cache import ReferenceEmbeddingCache, ReferenceStats
+from result_cache import ResultCache, ResultKey
+
+if TYPE_CHECKING:
+    from gold_index import GoldIndex
 
 
 warnings.filterwarnings("ignore")
@@ -22,9 +32,19 @@ warnings.filterwarnings("ignore")
 
 DEFAULT_INPUT_PATH = Path(".")
 DEFAULT_OUTPUT_PATH = Path("evals")
+SHARDS_DIR = "shards"  # --shard outputs, under the output directory
+DEFAULT_CHUNK_SIZE = 64  # rows whose steps are embedded together
+EMBED_BATCH_SIZE = 128
 SENTENCE_EMBEDDER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+SENTENCE_EMBEDDER_REVISION = "main"  # pin a commit hash to keep cached embeddings reproducible
 LONGFORMER_MODEL = "allenai/longformer-base-4096"
 MAX_TOKENS = 4096  # tokenizer upper bound for Longformer
+BERT_BATCH_SIZE = 16  # max pairs per batched BERTScore call
+BERT_TOKEN_BUDGET = 32768  # max padded tokens (pairs * 2 * longest) per batched call
+BERT_NUM_LAYERS: Optional[int] = None  # None = bert_score's default layer for LONGFORMER_MODEL
+BERT_INT8 = False  # dynamic int8 quantization of the Longformer linear layers (CPU only)
+PIPELINE_QUEUE_DEPTH = 4  # chunks buffered per stage with --pipeline-workers
+PIPELINE_MAX_BATCH_CHUNKS = 4  # already-parsed chunks merged into one inference call
 ALIGN_THRESHOLD = 0.45  # looser to avoid brittle zeros
 VALUE_REL_TOL = 0.15
 FINAL_REL_TOL = 0.05
@@ -34,13 +54,111 @@ DTW_ALPHA_SIM = 0.85
 DTW_BETA_NUM = 0.15
 DTW_SIM_ACCEPT = 0.45
 DTW_GAP_PENALTY = 0.25
+DTW_BAND: Optional[int] = None  # Sakoe-Chiba half-width in steps; None = exact DTW
+DTW_BAND_RATIO: Optional[float] = None  # half-width as a fraction of max(n_gold, n_pred)
+DTW_VARIANTS = ("bonus", "gate")
+DTW_METRIC_NAMES = ("precision", "recall", "f1", "avg_path_score", "norm_score")
+
+
+# Models are loaded on first use so that importing the parsing/alignment helpers
+# (or running --help) does not pull in torch and the scorer weights.
+_MODELS: Dict[str, Any] = {}
+_MODELS_LOCK = threading.RLock()
+
+
+def _get_or_load(name: str, loader: Callable[[], Any]) -> Any:
+    model = _MODELS.get(name)
+    if model is not None:
+        return model
+    with _MODELS_LOCK:
+        model = _MODELS.get(name)
+        if model is None:
+            model = loader()
+            _MODELS[name] = model
+    return model
+
+
+def get_device() -> str:
+    def load() -> str:
+        import torch
+
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    return _get_or_load("device", load)
+
+
+def get_embedder() -> Any:
+    def load() -> Any:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(SENTENCE_EMBEDDER_NAME, revision=SENTENCE_EMBEDDER_REVISION)
+
+    return _get_or_load("embedder", load)
+
+
+def get_bert_evaluator(num_layers: Optional[int] = BERT_NUM_LAYERS, int8: bool = BERT_INT8) -> Any:
+    def load() -> Any:
+        from bert_score import BERTScorer
+
+        # bert_score drops the encoder layers above num_layers, so they never run.
+        scorer = BERTScorer(model_type=LONGFORMER_MODEL, num_layers=num_layers, device=get_device())
+        if int8:
+            import torch
+
+            if get_device() != "cpu":
+                raise ValueError("int8 BERTScore quantization is only supported on CPU")
+            # Weights of every nn.Linear become int8; activations are quantized on the fly.
+            scorer._model = torch.quantization.quantize_dynamic(scorer._model, {torch.nn.Linear}, dtype=torch.qint8)
+        return scorer
+
+    name = "bert_evaluator"
+    if num_layers is not None or int8:
+        name = f"bert_evaluator/{bert_setting(num_layers, int8)}"
+    return _get_or_load(name, load)
+
+
+def bert_setting(num_layers: Optional[int], int8: bool) -> str:
+    return f"layers={num_layers}/{'int8' if int8 else 'fp32'}"
+
+
+def get_tokenizer() -> Any:
+    def load() -> Any:
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(LONGFORMER_MODEL)
+
+    return _get_or_load("tokenizer", load)
+
+
+def get_rouge() -> Any:
+    def load() -> Any:
+        from rouge_score import rouge_scorer as rouge_lib
 
+        return rouge_lib.RougeScorer(["rouge1", "rouge2", "rougeL", "rougeLsum"], use_stemmer=True)
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-EMBEDDER = SentenceTransformer(SENTENCE_EMBEDDER_NAME)
-BERT_EVALUATOR = BERTScorer(model_type=LONGFORMER_MODEL, device=DEVICE)
-TOKENIZER = AutoTokenizer.from_pretrained(LONGFORMER_MODEL)
-ROUGE = rouge_lib.RougeScorer(["rouge1", "rouge2", "rougeL", "rougeLsum"], use_stemmer=True)
+    return _get_or_load("rouge", load)
+
+
+_LAZY_GLOBALS: Dict[str, Callable[[], Any]] = {
+    "DEVICE": get_device,
+    "EMBEDDER": get_embedder,
+    "BERT_EVALUATOR": get_bert_evaluator,
+    "TOKENIZER": get_tokenizer,
+    "ROUGE": get_rouge,
+}
+
+
+def __getattr__(name: str) -> Any:
+    # Keep `evaluate_predictions.EMBEDDER` & co. working for external callers.
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pairwise_cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    return cosine_similarity(a, b)
 
 
 def read_jsonl(path: Path) -> Iterable[Dict[str, Any]]:
@@ -87,31 +205,104 @@ def parse_numeric_value(text: str) -> Optional[float]:
     return value
 
 
-def extract_final_value(step_text: str) -> Optional[Any]:
-    normalized = re.sub(r"\s+", " ", step_text).strip()
-
-    patterns = [
-        r"\**Answer:\**\s*.*?(?:USD|\$)?\s*([\d,]+(?:\.\d{1,2})?)",
-        r"=\s*(?!.*=)(?:USD|\$)?\s*[\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?",
-        r"\d[\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?",
-        r"(?<=\n|\.|:)\s*(answer: |final answer: |final answer is: )?"
-        r"([\d,]+(?:\.\d{1,2})?\s*(million|billion|thousand)?)",
-    ]
+# Numeric candidate extraction used by extract_final_value. The step is normalized and
+# lowercased once, and every candidate is read straight from precompiled patterns with
+# its span, so values come from the capture groups instead of a second parse. The kinds
+# reproduce the former regex cascade exactly, in priority order:
+#   "equals"  the number after the last "=" (optionally "$" prefixed); found with
+#             rfind plus one anchored match instead of a lookahead at every "="
+#   "number"  any number of two or more digit/comma characters
+#   "marker"  a number right after "." or ":" (optionally "answer: ...")
+# Numbers take thousands separators, up to two decimals and a million/billion/thousand
+# suffix; a trailing "%" is reported on the candidate but does not change its value.
+_NUMBER_TAIL = r"(?P<dec>\.\d{1,2})?\s*(?P<unit>million|billion|thousand)?"
+_EQUALS_PATTERN = re.compile(r"\s*\$?\s*(?P<run>[\d,]+)" + _NUMBER_TAIL)
+_NUMBER_PATTERN = re.compile(r"(?P<run>\d[\d,]+)" + _NUMBER_TAIL)
+_MARKER_PATTERN = re.compile(
+    r"(?<=[.:])\s*(?P<answer>answer: |final answer: |final answer is: )?(?P<run>[\d,]+)" + _NUMBER_TAIL
+)
+_SCALES = {"billion": 1_000_000_000, "million": 1_000_000, "thousand": 1_000}
+CANDIDATE_KINDS = ("equals", "number", "marker")
+
+
+class NumericCandidate(NamedTuple):
+    kind: str
+    start: int
+    end: int
+    value: Optional[Any]  # float, or the raw matched text when it holds no digits
+    currency: bool
+    percent: bool
+    answer: bool
+
+
+def normalize_step_text(step_text: str) -> str:
+    # Same as re.sub(r"\s+", " ", text).strip().lower(): str.split and \s share one
+    # definition of whitespace.
+    return " ".join(step_text.split()).lower()
+
+
+def _candidate_value(text: str, start: int, match: "re.Match[str]") -> Optional[Any]:
+    digits = match.group("run").replace(",", "") + (match.group("dec") or "")
+    if not digits:
+        return text[start : match.end()].strip()
+    value = float(digits)
+    unit = match.group("unit")
+    return value * _SCALES[unit] if unit else value
+
+
+def _to_candidate(kind: str, text: str, start: int, match: "re.Match[str]") -> NumericCandidate:
+    before = text[max(0, match.start("run") - 4) : match.start("run")].rstrip()
+    currency = before.endswith("$") or before.endswith("usd")
+    return NumericCandidate(
+        kind=kind,
+        start=start,
+        end=match.end(),
+        value=_candidate_value(text, start, match),
+        currency=currency,
+        percent=text.startswith("%", match.end()),
+        answer=kind == "marker" and match.group("answer") is not None,
+    )
+
+
+def _equals_candidates(text: str) -> List[NumericCandidate]:
+    position = text.rfind("=")
+    if position < 0:
+        return []
+    match = _EQUALS_PATTERN.match(text, position + 1)
+    return [_to_candidate("equals", text, position, match)] if match else []
+
+
+def _last_candidate(kind: str, text: str) -> Optional[NumericCandidate]:
+    if kind == "equals":
+        found = _equals_candidates(text)
+        return found[-1] if found else None
+    pattern = _NUMBER_PATTERN if kind == "number" else _MARKER_PATTERN
+    last = None
+    for last in pattern.finditer(text):
+        pass
+    return _to_candidate(kind, text, last.start(), last) if last else None
 
-    for pattern in patterns:
-        matches = list(re.finditer(pattern, normalized.lower()))
-        if matches:
-            candidate = matches[-1].group(0)
-            value = parse_numeric_value(candidate)
-            return value if value is not None else candidate.strip()
+
+def scan_numeric_candidates(step_text: str) -> List[NumericCandidate]:
+    text = normalize_step_text(step_text)
+    candidates = _equals_candidates(text)
+    for kind, pattern in (("number", _NUMBER_PATTERN), ("marker", _MARKER_PATTERN)):
+        candidates.extend(_to_candidate(kind, text, match.start(), match) for match in pattern.finditer(text))
+    return candidates
+
+
+def extract_final_value(step_text: str) -> Optional[Any]:
+    text = normalize_step_text(step_text)
+    for kind in CANDIDATE_KINDS:
+        candidate = _last_candidate(kind, text)
+        if candidate is not None:
+            return candidate.value
     return None
 
 
-def split_trace_into_steps(
-    trace_text: Optional[str],
-) -> Tuple[List[str], List[Optional[Any]], Optional[Any]]:
+def split_trace_text(trace_text: Optional[str]) -> List[str]:
     if not isinstance(trace_text, str):
-        return [], [], None
+        return []
 
     content = trace_text.split("\nuser\n")[0] if "\nuser\n" in trace_text else trace_text
     step_matches = list(
@@ -133,85 +324,390 @@ def split_trace_into_steps(
         raw_steps = [ln.strip() for ln in content.splitlines() if ln.strip()]
 
     cleaned_steps = [re.sub(r"(?i)Step\s*\d*\s*:?", "", step).strip() for step in raw_steps]
-    steps = [re.sub(r"\s+", " ", step) for step in cleaned_steps if step]
+    return [re.sub(r"\s+", " ", step) for step in cleaned_steps if step]
+
 
+def split_trace_into_steps(
+    trace_text: Optional[str],
+) -> Tuple[List[str], List[Optional[Any]], Optional[Any]]:
+    if not isinstance(trace_text, str):
+        return [], [], None
+
+    steps = split_trace_text(trace_text)
     values = [extract_final_value(step) for step in steps]
     final_value = next((value for value in reversed(values) if value is not None), None)
     return steps, values, final_value
 
 
-def compute_bert_score(reference: Any, candidate: Any) -> float:
+# Per-trace artifacts shared by every metric so each row is parsed and embedded once.
+@dataclass
+class ParsedTrace:
+    steps: List[str] = field(default_factory=list)
+    values: List[Optional[Any]] = field(default_factory=list)
+    final_value: Optional[Any] = None
+    embeddings: Optional[np.ndarray] = None
+    # ROUGE tokens of the whole text and of each line (rougeLsum), when precomputed.
+    rouge_tokens: Optional[Tuple[List[str], List[List[str]]]] = None
+
+
+def parse_trace(trace_text: Optional[str]) -> ParsedTrace:
+    steps, values, final_value = split_trace_into_steps(trace_text)
+    return ParsedTrace(steps=steps, values=values, final_value=final_value)
+
+
+def ensure_step_embeddings(trace: ParsedTrace) -> np.ndarray:
+    if trace.embeddings is None:
+        trace.embeddings = get_embedder().encode(trace.steps)
+    return trace.embeddings
+
+
+def open_embedding_cache(root: Optional[Path]) -> Optional[EmbeddingCache]:
+    if root is None:
+        return None
+    return EmbeddingCache(root, SENTENCE_EMBEDDER_NAME, SENTENCE_EMBEDDER_REVISION)
+
+
+def embed_traces(
+    traces: List[ParsedTrace],
+    cache: Optional[EmbeddingCache] = None,
+    cached_traces: Iterable[ParsedTrace] = (),
+) -> None:
+    # Encode the steps of many traces in one call and scatter the rows back.
+    # SentenceTransformer.encode already sorts its inputs by length before batching.
+    # Steps of `cached_traces` (the gold side) are read from / written to `cache`.
+    pending = [trace for trace in traces if trace.embeddings is None and trace.steps]
+    if not pending:
+        return
+
+    texts: Dict[str, None] = {}
+    for trace in pending:
+        for step in trace.steps:
+            texts.setdefault(step, None)
+    cacheable = {step for trace in cached_traces for step in trace.steps} if cache is not None else set()
+    vectors = cache.lookup(step for step in texts if step in cacheable) if cacheable else {}
+
+    missing = [step for step in texts if step not in vectors]
+    if missing:
+        encoded = np.asarray(get_embedder().encode(missing, batch_size=EMBED_BATCH_SIZE))
+        fresh = dict(zip(missing, encoded))
+        vectors.update(fresh)
+        if cacheable:
+            cache.add({step: vector for step, vector in fresh.items() if step in cacheable})
+
+    for trace in pending:
+        trace.embeddings = np.stack([vectors[step] for step in trace.steps])
+
+
+def compute_bert_score(
+    reference: Any, candidate: Any, num_layers: Optional[int] = BERT_NUM_LAYERS, int8: bool = BERT_INT8
+) -> float:
     if not isinstance(reference, str) or not isinstance(candidate, str):
         return 0.0
     if not reference.strip() or not candidate.strip():
         return 0.0
 
-    ref_tokens = TOKENIZER(reference, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
-    cand_tokens = TOKENIZER(candidate, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
+    tokenizer = get_tokenizer()
+    ref_tokens = tokenizer(reference, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
+    cand_tokens = tokenizer(candidate, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
     try:
-        ref_text = TOKENIZER.batch_decode(ref_tokens["input_ids"], skip_special_tokens=True)[0]
-        cand_text = TOKENIZER.batch_decode(cand_tokens["input_ids"], skip_special_tokens=True)[0]
-        _, _, f1 = BERT_EVALUATOR.score([ref_text], [cand_text])
+        ref_text = tokenizer.batch_decode(ref_tokens["input_ids"], skip_special_tokens=True)[0]
+        cand_text = tokenizer.batch_decode(cand_tokens["input_ids"], skip_special_tokens=True)[0]
+        _, _, f1 = get_bert_evaluator(num_layers, int8).score([ref_text], [cand_text])
         return f1[0].item()
     except Exception:
         return 0.0
 
 
+def open_reference_cache(
+    root: Optional[Path], num_layers: Optional[int] = BERT_NUM_LAYERS, int8: bool = BERT_INT8
+) -> Optional[ReferenceEmbeddingCache]:
+    if root is None:
+        return None
+    return ReferenceEmbeddingCache(root, LONGFORMER_MODEL, bert_setting(num_layers, int8))
+
+
+def bert_token_stats(evaluator: Any, sentences: List[str]) -> Dict[str, ReferenceStats]:
+    # Per-sentence token embeddings and idf weights, as BERTScorer.score computes them
+    # before greedy matching (bert_score.utils.bert_cos_score_idf).
+    from bert_score.utils import get_bert_embedding
+
+    if evaluator.idf:
+        idf_dict = evaluator._idf_dict
+    else:
+        idf_dict = defaultdict(lambda: 1.0)
+        idf_dict[evaluator._tokenizer.sep_token_id] = 0
+        idf_dict[evaluator._tokenizer.cls_token_id] = 0
+    ordered = sorted(set(sentences), key=lambda text: len(text.split(" ")), reverse=True)
+    embeddings, masks, padded_idf = get_bert_embedding(
+        ordered, evaluator._model, evaluator._tokenizer, idf_dict, device=evaluator.device
+    )
+    stats: Dict[str, ReferenceStats] = {}
+    for i, sentence in enumerate(ordered):
+        length = int(masks[i].sum().item())
+        stats[sentence] = (
+            embeddings[i, :length].float().cpu().numpy(),
+            padded_idf[i, :length].float().cpu().numpy(),
+        )
+    return stats
+
+
+def cached_bert_f1(
+    evaluator: Any, refs: List[str], cands: List[str], cache: ReferenceEmbeddingCache
+) -> List[float]:
+    # Reference statistics come from `cache` (encoding and storing only the misses),
+    # candidates are encoded fresh; F1 is bert_score's greedy_cos_idf over both.
+    import torch
+    from bert_score.utils import greedy_cos_idf
+    from torch.nn.utils.rnn import pad_sequence
+
+    ref_stats = cache.lookup(refs)
+    missing = [ref for ref in dict.fromkeys(refs) if ref not in ref_stats]
+    if missing:
+        fresh = bert_token_stats(evaluator, missing)
+        cache.add(fresh)
+        ref_stats.update(fresh)
+    cand_stats = bert_token_stats(evaluator, cands)
+
+    def pad(stats: List[ReferenceStats]) -> Tuple[Any, Any, Any]:
+        embeddings = [torch.from_numpy(vectors) for vectors, _ in stats]
+        idf = [torch.from_numpy(weights) for _, weights in stats]
+        lengths = torch.tensor([len(vectors) for vectors in embeddings])
+        mask = torch.arange(int(lengths.max())).expand(len(lengths), -1) < lengths.unsqueeze(1)
+        # pad_sequence copies, so greedy_cos_idf's in-place normalization leaves the stats alone.
+        return (
+            pad_sequence(embeddings, batch_first=True, padding_value=2.0).to(evaluator.device),
+            mask.to(evaluator.device),
+            pad_sequence(idf, batch_first=True).to(evaluator.device),
+        )
+
+    with torch.no_grad():
+        _, _, f1 = greedy_cos_idf(
+            *pad([ref_stats[ref] for ref in refs]), *pad([cand_stats[cand] for cand in cands])
+        )
+    return f1.tolist()
+
+
+def bucket_by_length(
+    lengths: Dict[int, int], batch_size: int, token_budget: int
+) -> List[List[int]]:
+    # Group similarly sized pairs so padding inside each BERTScore call stays small.
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for idx in sorted(lengths, key=lambda k: lengths[k]):
+        longest_with = max(longest, lengths[idx])
+        if current and (len(current) >= batch_size or 2 * (len(current) + 1) * longest_with > token_budget):
+            buckets.append(current)
+            current, longest_with = [], lengths[idx]
+        current.append(idx)
+        longest = longest_with
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def compute_bert_scores(
+    pairs: List[Tuple[Any, Any]],
+    batch_size: int = BERT_BATCH_SIZE,
+    token_budget: int = BERT_TOKEN_BUDGET,
+    num_layers: Optional[int] = BERT_NUM_LAYERS,
+    int8: bool = BERT_INT8,
+    reference_cache: Optional[ReferenceEmbeddingCache] = None,
+    single_pair: bool = False,
+) -> List[float]:
+    if single_pair:
+        # One BERTScorer.score call per pair: the exact numbers of the unbatched path.
+        return [compute_bert_score(*pair, num_layers=num_layers, int8=int8) for pair in pairs]
+    scores = [0.0] * len(pairs)
+    tokenizer = get_tokenizer()
+
+    texts: Dict[int, Tuple[str, str]] = {}
+    lengths: Dict[int, int] = {}
+    for idx, (reference, candidate) in enumerate(pairs):
+        if not isinstance(reference, str) or not isinstance(candidate, str):
+            continue
+        if not reference.strip() or not candidate.strip():
+            continue
+        ref_tokens = tokenizer(reference, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
+        cand_tokens = tokenizer(candidate, return_tensors="pt", truncation=True, max_length=MAX_TOKENS)
+        try:
+            ref_text = tokenizer.batch_decode(ref_tokens["input_ids"], skip_special_tokens=True)[0]
+            cand_text = tokenizer.batch_decode(cand_tokens["input_ids"], skip_special_tokens=True)[0]
+        except Exception:
+            continue
+        texts[idx] = (ref_text, cand_text)
+        lengths[idx] = max(ref_tokens["input_ids"].shape[1], cand_tokens["input_ids"].shape[1])
+
+    evaluator = get_bert_evaluator(num_layers, int8)
+    for bucket in bucket_by_length(lengths, batch_size, token_budget):
+        refs = [texts[idx][0] for idx in bucket]
+        cands = [texts[idx][1] for idx in bucket]
+        try:
+            if reference_cache is not None:
+                f1 = cached_bert_f1(evaluator, refs, cands, reference_cache)
+            else:
+                # Same argument order as compute_bert_score; one forward batch per bucket.
+                _, _, f1 = evaluator.score(refs, cands, batch_size=2 * len(bucket))
+                f1 = f1.tolist()
+        except Exception:
+            # Isolate the failing pair instead of zeroing the whole bucket.
+            for idx in bucket:
+                scores[idx] = compute_bert_score(*pairs[idx], num_layers=num_layers, int8=int8)
+            continue
+        for idx, value in zip(bucket, f1):
+            scores[idx] = value
+    return scores
+
+
+def bag_of_words_matrix(texts_a: List[str], texts_b: List[str]) -> np.ndarray:
+    # Pairwise bag_of_words_cosine over two lists; each text is tokenized once into a
+    # count vector over the shared vocabulary. Counts are small integers, so dots and
+    # norms are exact and the result matches bag_of_words_cosine bit for bit.
+    # Pairs where either text has no tokens come out as NaN.
+    counts_a = [Counter(text.split()) for text in texts_a]
+    counts_b = [Counter(text.split()) for text in texts_b]
+    vocab: Dict[str, int] = {}
+    for counts in counts_a + counts_b:
+        for token in counts:
+            vocab.setdefault(token, len(vocab))
+
+    def to_matrix(all_counts: List[Counter]) -> np.ndarray:
+        matrix = np.zeros((len(all_counts), len(vocab)), dtype=float)
+        for row, counts in enumerate(all_counts):
+            for token, count in counts.items():
+                matrix[row, vocab[token]] = count
+        return matrix
+
+    vectors_a, vectors_b = to_matrix(counts_a), to_matrix(counts_b)
+    norms_a = np.sqrt(np.sum(vectors_a * vectors_a, axis=1))
+    norms_b = np.sqrt(np.sum(vectors_b * vectors_b, axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = (vectors_a @ vectors_b.T) / (norms_a[:, None] * norms_b[None, :])
+    similarity[(norms_a == 0)[:, None] | (norms_b == 0)[None, :]] = np.nan
+    return similarity
+
+
+def value_agreement_matrix(
+    gold_values: List[Optional[Any]], pred_values: List[Optional[Any]]
+) -> np.ndarray:
+    # 1.0 where a gold/pred step value pair agrees: either side missing, both numeric
+    # within VALUE_REL_TOL, or (if either is a string) bag-of-words cosine >= 0.3.
+    gold_missing = np.array([value is None for value in gold_values], dtype=bool)
+    pred_missing = np.array([value is None for value in pred_values], dtype=bool)
+    gold_text = np.array([isinstance(value, str) for value in gold_values], dtype=bool)
+    pred_text = np.array([isinstance(value, str) for value in pred_values], dtype=bool)
+    gold_num = np.array(
+        [np.nan if value is None or isinstance(value, str) else value for value in gold_values], dtype=float
+    )
+    pred_num = np.array(
+        [np.nan if value is None or isinstance(value, str) else value for value in pred_values], dtype=float
+    )
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        agree = np.abs(gold_num[:, None] - pred_num[None, :]) / (np.abs(gold_num)[:, None] + 1e-4) < VALUE_REL_TOL
+
+    text_cells = (gold_text[:, None] | pred_text[None, :]) & ~gold_missing[:, None] & ~pred_missing[None, :]
+    if text_cells.any():
+        rows = np.flatnonzero(text_cells.any(axis=1))
+        cols = np.flatnonzero(text_cells.any(axis=0))
+        similarity = bag_of_words_matrix(
+            [str(gold_values[i]) for i in rows], [str(pred_values[j]) for j in cols]
+        )
+        with np.errstate(invalid="ignore"):
+            text_agree = (similarity >= 0.3) & (similarity <= 1.0)
+        block = np.ix_(rows, cols)
+        agree[block] = np.where(text_cells[block], text_agree, agree[block])
+
+    agree |= gold_missing[:, None] | pred_missing[None, :]
+    return agree.astype(float)
+
+
 def build_value_match_mask(
     gold_values: List[Optional[Any]], pred_values: List[Optional[Any]]
 ) -> np.ndarray:
-    mask = np.zeros((len(gold_values), len(pred_values)), dtype=float)
-    for i, gold in enumerate(gold_values):
-        if gold is None:
-            mask[i, :] = 1.0  # allow text similarity when numeric missing
-            continue
-        for j, pred in enumerate(pred_values):
-            if pred is None:
-                mask[i, j] = 1.0
-                continue
-            if isinstance(gold, str) or isinstance(pred, str):
-                if bag_of_words_cosine(str(gold), str(pred), min_val=0.3):
-                    mask[i, j] = 1.0
-            else:
-                denominator = abs(gold) + 1e-4
-                if abs(gold - pred) / denominator < VALUE_REL_TOL:
-                    mask[i, j] = 1.0
-    return mask
+    return value_agreement_matrix(gold_values, pred_values)
+
+
+def rouge_reference_tokens(text: str) -> Tuple[List[str], List[List[str]]]:
+    # Mirrors RougeScorer.score's tokenization (rougeLsum splits summaries on newlines).
+    tokenizer = get_rouge()._tokenizer
+    return tokenizer.tokenize(text), [tokenizer.tokenize(line) for line in text.split("\n") if len(line)]
+
 
+def score_rouge(
+    reference: str, candidate: str, reference_tokens: Optional[Tuple[List[str], List[List[str]]]] = None
+) -> Dict[str, Any]:
+    if reference_tokens is None:
+        return get_rouge().score(reference, candidate)
 
-def score_trace(gold: Optional[str], pred: Optional[str]) -> Tuple[float, float, int, float, float, float, float]:
+    # Same computation as RougeScorer.score, reusing the reference tokens.
+    from rouge_score import rouge_scorer as rouge_lib
+
+    target_tokens, target_lines = reference_tokens
+    prediction_tokens, prediction_lines = rouge_reference_tokens(candidate)
+    return {
+        "rouge1": rouge_lib._score_ngrams(
+            rouge_lib._create_ngrams(target_tokens, 1), rouge_lib._create_ngrams(prediction_tokens, 1)
+        ),
+        "rouge2": rouge_lib._score_ngrams(
+            rouge_lib._create_ngrams(target_tokens, 2), rouge_lib._create_ngrams(prediction_tokens, 2)
+        ),
+        "rougeL": rouge_lib._score_lcs(target_tokens, prediction_tokens),
+        "rougeLsum": rouge_lib._summary_level_lcs(target_lines, prediction_lines),
+    }
+
+
+def score_trace(
+    gold: Optional[str],
+    pred: Optional[str],
+    gold_trace: Optional[ParsedTrace] = None,
+    pred_trace: Optional[ParsedTrace] = None,
+    bert: Optional[float] = None,
+    agreement: Optional[np.ndarray] = None,
+    rouge_scores: Optional[Dict[str, Any]] = None,
+) -> Tuple[float, float, int, float, float, float, float]:
     if not isinstance(gold, str) or not isinstance(pred, str):
         return 0.0, 0.0, 0, 0.0, 0.0, 0.0, 0.0
 
-    rouge_scores = ROUGE.score(gold, pred)
+    if rouge_scores is None:
+        rouge_scores = score_rouge(gold, pred, gold_trace.rouge_tokens if gold_trace is not None else None)
     rouge2 = rouge_scores["rouge2"].fmeasure
     rouge_l = rouge_scores["rougeL"].fmeasure
     rouge_lsum = rouge_scores["rougeLsum"].fmeasure
-    bert = compute_bert_score(gold, pred)
-
-    gold_steps, gold_values, gold_final = split_trace_into_steps(gold)
-    pred_steps, pred_values, pred_final = split_trace_into_steps(pred)
-    if not gold_steps or not pred_steps:
+    if bert is None:
+        bert = compute_bert_score(gold, pred)
+
+    if gold_trace is None:
+        gold_trace = parse_trace(gold)
+    if pred_trace is None:
+        pred_trace = parse_trace(pred)
+    if not gold_trace.steps or not pred_trace.steps:
         return 0.0, 0.0, 0, rouge2, rouge_l, rouge_lsum, bert
 
-    gold_emb = EMBEDDER.encode(gold_steps)
-    pred_emb = EMBEDDER.encode(pred_steps)
-    sentence_sim = pairwise_cosine(gold_emb, pred_emb)
+    recall, precision = step_recall_precision(gold_trace, pred_trace, agreement)
+    fam = final_answer_match(gold_trace.final_value, pred_trace.final_value)
+    return recall, precision, fam, rouge2, rouge_l, rouge_lsum, bert
+
+
+def step_recall_precision(
+    gold_trace: ParsedTrace, pred_trace: ParsedTrace, agreement: Optional[np.ndarray] = None
+) -> Tuple[float, float]:
+    sentence_sim = pairwise_cosine(ensure_step_embeddings(gold_trace), ensure_step_embeddings(pred_trace))
 
-    mask = build_value_match_mask(gold_values, pred_values)
+    mask = agreement if agreement is not None else build_value_match_mask(gold_trace.values, pred_trace.values)
     masked_sim = np.multiply(sentence_sim, mask)
 
-    recall = float(np.sum(np.max(masked_sim, axis=1) > ALIGN_THRESHOLD) / len(gold_steps))
-    precision = float(np.sum(np.max(masked_sim, axis=0) > ALIGN_THRESHOLD) / len(pred_steps))
+    recall = float(np.sum(np.max(masked_sim, axis=1) > ALIGN_THRESHOLD) / len(gold_trace.steps))
+    precision = float(np.sum(np.max(masked_sim, axis=0) > ALIGN_THRESHOLD) / len(pred_trace.steps))
+    return recall, precision
 
-    if gold_final is None or pred_final is None:
-        fam = 0
-    elif isinstance(gold_final, str) or isinstance(pred_final, str):
-        fam = 1 if bag_of_words_cosine(str(gold_final), str(pred_final), min_val=0.1) else 0
-    else:
-        fam = int(abs(gold_final - pred_final) / (abs(gold_final) + 1e-4) < FINAL_REL_TOL)
 
-    return recall, precision, fam, rouge2, rouge_l, rouge_lsum, bert
+def final_answer_match(gold_final: Optional[Any], pred_final: Optional[Any]) -> int:
+    if gold_final is None or pred_final is None:
+        return 0
+    if isinstance(gold_final, str) or isinstance(pred_final, str):
+        return 1 if bag_of_words_cosine(str(gold_final), str(pred_final), min_val=0.1) else 0
+    return int(abs(gold_final - pred_final) / (abs(gold_final) + 1e-4) < FINAL_REL_TOL)
 
 
 def numeric_or_string_agree(a: Optional[Any], b: Optional[Any]) -> float:
@@ -227,51 +723,138 @@ def build_similarity_and_bonus(
     pred_steps: List[str],
     gold_values: List[Optional[Any]],
     pred_values: List[Optional[Any]],
+    gold_emb: Optional[np.ndarray] = None,
+    pred_emb: Optional[np.ndarray] = None,
+    bonus: Optional[np.ndarray] = None,
 ) -> Tuple[np.ndarray, np.ndarray]:
     if not gold_steps or not pred_steps:
         empty = np.zeros((len(gold_steps), len(pred_steps)))
         return empty, empty
 
-    gold_emb = EMBEDDER.encode(gold_steps)
-    pred_emb = EMBEDDER.encode(pred_steps)
+    if gold_emb is None:
+        gold_emb = get_embedder().encode(gold_steps)
+    if pred_emb is None:
+        pred_emb = get_embedder().encode(pred_steps)
     similarity = np.clip(pairwise_cosine(gold_emb, pred_emb), 0.0, 1.0)
 
-    bonus = np.zeros_like(similarity)
-    for i in range(len(gold_steps)):
-        for j in range(len(pred_steps)):
-            bonus[i, j] = numeric_or_string_agree(gold_values[i], pred_values[j])
-    return similarity, bonus
-
-
-def align_with_stats(cost: np.ndarray, gap_cost: float) -> Tuple[List[Tuple[int, int]], int, float]:
-    n, m = cost.shape
-    dp = np.full((n + 1, m + 1), np.inf, dtype=float)
-    backtrack = np.zeros((n + 1, m + 1), dtype=int)
-    dp[0, 0] = 0.0
-
-    for i in range(1, n + 1):
-        dp[i, 0] = dp[i - 1, 0] + gap_cost
-        backtrack[i, 0] = 2
-    for j in range(1, m + 1):
-        dp[0, j] = dp[0, j - 1] + gap_cost
-        backtrack[0, j] = 3
-
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            candidates = [
-                dp[i - 1, j - 1] + cost[i - 1, j - 1],
-                dp[i - 1, j] + gap_cost,
-                dp[i, j - 1] + gap_cost,
-            ]
-            choice = int(np.argmin(candidates))
-            dp[i, j] = candidates[choice]
-            backtrack[i, j] = [1, 2, 3][choice]
-
+    if bonus is None:
+        bonus = value_agreement_matrix(gold_values, pred_values)
+    # Keep the bonus in the similarity dtype (float32 embeddings) as the DTW scores always were.
+    return similarity, bonus.astype(similarity.dtype, copy=False)
+
+
+def align_many(costs: np.ndarray, gap_cost: float) -> List[Tuple[List[Tuple[int, int]], int, float]]:
+    # Align a stack of (n, m) cost matrices at once. The DP is filled one anti-diagonal
+    # (i + j == d) at a time, since every cell on it depends only on the two previous
+    # diagonals. Ties resolve diag, up, left, like np.argmin over that candidate order.
+    k, n, m = costs.shape
+    dp = np.full((k, n + 1, m + 1), np.inf, dtype=float)
+    backtrack = np.zeros((k, n + 1, m + 1), dtype=np.int8)
+    dp[:, 0, 0] = 0.0
+    dp[:, 1:, 0] = np.cumsum(np.full(n, gap_cost, dtype=float))
+    dp[:, 0, 1:] = np.cumsum(np.full(m, gap_cost, dtype=float))
+    backtrack[:, 1:, 0] = 2
+    backtrack[:, 0, 1:] = 3
+
+    for d in range(2, n + m + 1):
+        rows = np.arange(max(1, d - m), min(n, d - 1) + 1)
+        cols = d - rows
+        best = dp[:, rows - 1, cols - 1] + costs[:, rows - 1, cols - 1]
+        move = np.ones_like(best, dtype=np.int8)
+        up = dp[:, rows - 1, cols] + gap_cost
+        take = up < best
+        best = np.where(take, up, best)
+        move[take] = 2
+        left = dp[:, rows, cols - 1] + gap_cost
+        take = left < best
+        best = np.where(take, left, best)
+        move[take] = 3
+        dp[:, rows, cols] = best
+        backtrack[:, rows, cols] = move
+
+    return [backtrack_path(backtrack[idx], n, m, float(dp[idx, n, m])) for idx in range(k)]
+
+
+def sakoe_chiba_width(
+    n: int, m: int, band: Optional[int] = DTW_BAND, band_ratio: Optional[float] = DTW_BAND_RATIO
+) -> Optional[int]:
+    widths = []
+    if band is not None:
+        widths.append(int(band))
+    if band_ratio is not None:
+        widths.append(int(math.ceil(band_ratio * max(n, m))))
+    if not widths:
+        return None
+    # The band follows the slanted diagonal j = i * m / n; it must be at least as wide
+    # as one row's slope so consecutive rows overlap and (n, m) stays reachable.
+    width = max(max(widths), int(math.ceil(m / max(n, 1))), 1)
+    return None if width >= max(n, m) else width
+
+
+def sakoe_chiba_bounds(n: int, m: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    center = np.arange(n + 1) * (m / max(n, 1))
+    lo = np.clip(np.floor(center - width), 0, m).astype(int)
+    hi = np.clip(np.ceil(center + width), 0, m).astype(int)
+    return lo, hi
+
+
+def align_many_banded(
+    costs: np.ndarray, gap_cost: float, width: int
+) -> List[Tuple[List[Tuple[int, int]], int, float]]:
+    # Same recurrence and tie-breaking as align_many, restricted to a Sakoe-Chiba band.
+    # Row i only stores columns lo[i] - 1 .. lo[i] + band - 2, so dp/backtrack are
+    # (k, n + 1, band) instead of (k, n + 1, m + 1). Stored cells outside the band are
+    # never written and stay +inf, which lets the neighbour reads skip any masking.
+    k, n, m = costs.shape
+    lo, hi = sakoe_chiba_bounds(n, m, width)
+    band = int(max(np.max(hi - lo), np.max(hi[1:] - lo[:-1], initial=0))) + 2
+    dp = np.full((k, n + 1, band), np.inf, dtype=float)
+    backtrack = np.zeros((k, n + 1, band), dtype=np.int8)
+
+    dp[:, 0, 1 : hi[0] + 2] = np.concatenate([[0.0], np.cumsum(np.full(hi[0], gap_cost, dtype=float))])
+    backtrack[:, 0, 2 : hi[0] + 2] = 3
+    first_col = np.flatnonzero(lo == 0)[1:]
+    dp[:, first_col, 1] = np.cumsum(np.full(len(first_col), gap_cost, dtype=float))
+    backtrack[:, first_col, 1] = 2
+
+    # Rows touching anti-diagonal d satisfy i + lo[i] <= d <= i + hi[i]; both sides
+    # are increasing in i, so the rows form a contiguous range found by bisection.
+    starts = np.arange(n + 1) + lo
+    ends = np.arange(n + 1) + hi
+    offset = 1 - lo
+    for d in range(2, n + m + 1):
+        first = max(1, int(np.searchsorted(ends, d, side="left")))
+        last = min(d - 1, int(np.searchsorted(starts, d, side="right")) - 1)
+        if first > last:
+            continue
+        rows = np.arange(first, last + 1)
+        cols = d - rows
+        prev = cols + offset[rows - 1]
+        here = cols + offset[rows]
+        best = dp[:, rows - 1, prev - 1] + costs[:, rows - 1, cols - 1]
+        move = np.ones_like(best, dtype=np.int8)
+        up = dp[:, rows - 1, prev] + gap_cost
+        take = up < best
+        best = np.where(take, up, best)
+        move[take] = 2
+        left = dp[:, rows, here - 1] + gap_cost
+        take = left < best
+        best = np.where(take, left, best)
+        move[take] = 3
+        dp[:, rows, here] = best
+        backtrack[:, rows, here] = move
+
+    return [backtrack_path(backtrack[idx], n, m, float(dp[idx, n, m + offset[n]]), offset) for idx in range(k)]
+
+
+def backtrack_path(
+    backtrack: np.ndarray, n: int, m: int, total_cost: float, offset: Optional[np.ndarray] = None
+) -> Tuple[List[Tuple[int, int]], int, float]:
     i, j = n, m
     path: List[Tuple[int, int]] = []
     path_len = 0
     while i > 0 or j > 0:
-        move = backtrack[i, j]
+        move = backtrack[i, j] if offset is None else backtrack[i, j + offset[i]]
         path_len += 1
         if move == 1:
             path.append((i - 1, j - 1))
@@ -282,11 +865,15 @@ def align_with_stats(cost: np.ndarray, gap_cost: float) -> Tuple[List[Tuple[int,
         else:
             j -= 1
     path.reverse()
-    return path, path_len, float(dp[n, m])
+    return path, path_len, total_cost
+
+
+def align_with_stats(cost: np.ndarray, gap_cost: float) -> Tuple[List[Tuple[int, int]], int, float]:
+    return align_many(cost[np.newaxis], gap_cost)[0]
 
 
 def dtw_metrics_from_score(
-    score: np.ndarray, pairs: List[Tuple[int, int]], n_gold: int, n_pred: int
+    score: np.ndarray, pairs: List[Tuple[int, int]], n_gold: int, n_pred: int, accept: float = DTW_SIM_ACCEPT
 ) -> Dict[str, float]:
     matched_gold = set()
     matched_pred = set()
@@ -295,7 +882,7 @@ def dtw_metrics_from_score(
     for i, j in pairs:
         value = score[i, j]
         path_scores.append(value)
-        if value >= DTW_SIM_ACCEPT:
+        if value >= accept:
             matched_gold.add(i)
             matched_pred.add(j)
 
@@ -311,33 +898,202 @@ def dtw_metrics_from_score(
     )
 
 
-def compute_dtw_metrics(gold: Optional[str], pred: Optional[str]) -> Dict[str, Dict[str, float]]:
+def bag_of_words_similarity(gold_steps: List[str], pred_steps: List[str]) -> np.ndarray:
+    # Torch-free stand-in for the embedding cosine: bag-of-words cosine of normalized steps.
+    similarity = bag_of_words_matrix(
+        [normalize_step_text(step) for step in gold_steps], [normalize_step_text(step) for step in pred_steps]
+    )
+    return np.nan_to_num(similarity, nan=0.0)
+
+
+def numeric_step_match(
+    gold_trace: ParsedTrace, pred_trace: ParsedTrace, agreement: Optional[np.ndarray] = None
+) -> Tuple[float, float]:
+    # Only steps carrying a value take part: a step is matched when some step with a value
+    # on the other side agrees with it (the "missing value agrees" rule is not applied).
+    mask = agreement if agreement is not None else build_value_match_mask(gold_trace.values, pred_trace.values)
+    gold_has = np.array([value is not None for value in gold_trace.values], dtype=bool)
+    pred_has = np.array([value is not None for value in pred_trace.values], dtype=bool)
+    matched = (mask > 0) & gold_has[:, None] & pred_has[None, :]
+    recall = float(matched.any(axis=1).sum() / gold_has.sum()) if gold_has.any() else 0.0
+    precision = float(matched.any(axis=0).sum() / pred_has.sum()) if pred_has.any() else 0.0
+    return recall, precision
+
+
+def compute_lite_dtw_metrics(
+    gold_trace: ParsedTrace,
+    pred_trace: ParsedTrace,
+    band: Optional[int] = DTW_BAND,
+    band_ratio: Optional[float] = DTW_BAND_RATIO,
+    agreement: Optional[np.ndarray] = None,
+) -> Dict[str, float]:
+    n, m = len(gold_trace.steps), len(pred_trace.steps)
+    if n == 0 or m == 0:
+        return dict(precision=0.0, recall=0.0, f1=0.0, avg_path_score=0.0, norm_score=0.0)
+
+    # The "bonus" DTW score with bag-of-words similarity in place of embeddings.
+    similarity = bag_of_words_similarity(gold_trace.steps, pred_trace.steps)
+    if agreement is None:
+        agreement = value_agreement_matrix(gold_trace.values, pred_trace.values)
+    scores = np.clip(DTW_ALPHA_SIM * similarity + DTW_BETA_NUM * agreement, 0.0, 1.0)[np.newaxis]
+    alignments = align_dtw(scores, sakoe_chiba_width(n, m, band, band_ratio))
+    return dtw_metrics_from_scores(scores, alignments, n, m, ("lite",))["lite"]
+
+
+def compute_dtw_metrics(
+    gold: Optional[str],
+    pred: Optional[str],
+    gold_trace: Optional[ParsedTrace] = None,
+    pred_trace: Optional[ParsedTrace] = None,
+    band: Optional[int] = DTW_BAND,
+    band_ratio: Optional[float] = DTW_BAND_RATIO,
+    agreement: Optional[np.ndarray] = None,
+    variants: Tuple[str, ...] = DTW_VARIANTS,
+) -> Dict[str, Dict[str, float]]:
     if not isinstance(gold, str) or not isinstance(pred, str):
         zero = dict(precision=0.0, recall=0.0, f1=0.0, avg_path_score=0.0, norm_score=0.0)
-        return {"bonus": zero, "gate": zero}
+        return {variant: zero for variant in variants}
 
-    gold_steps, gold_values, _ = split_trace_into_steps(gold)
-    pred_steps, pred_values, _ = split_trace_into_steps(pred)
-    n, m = len(gold_steps), len(pred_steps)
+    if gold_trace is None:
+        gold_trace = parse_trace(gold)
+    if pred_trace is None:
+        pred_trace = parse_trace(pred)
+    n, m = len(gold_trace.steps), len(pred_trace.steps)
     if n == 0 or m == 0:
         zero = dict(precision=0.0, recall=0.0, f1=0.0, avg_path_score=0.0, norm_score=0.0)
-        return {"bonus": zero, "gate": zero}
+        return {variant: zero for variant in variants}
+
+    similarity, bonus = build_similarity_and_bonus(
+        gold_trace.steps,
+        pred_trace.steps,
+        gold_trace.values,
+        pred_trace.values,
+        gold_emb=ensure_step_embeddings(gold_trace),
+        pred_emb=ensure_step_embeddings(pred_trace),
+        bonus=agreement,
+    )
 
-    similarity, bonus = build_similarity_and_bonus(gold_steps, pred_steps, gold_values, pred_values)
+    band_width = sakoe_chiba_width(n, m, band, band_ratio)
+    scores = dtw_score_matrices(similarity, bonus)
+    if variants != DTW_VARIANTS:
+        scores = scores[[DTW_VARIANTS.index(variant) for variant in variants]]
+    return dtw_metrics_from_scores(scores, align_dtw(scores, band_width), n, m, variants)
 
-    score_bonus = np.clip(DTW_ALPHA_SIM * similarity + DTW_BETA_NUM * bonus, 0.0, 1.0)
-    cost_bonus = 1.0 - score_bonus
-    pairs_bonus, len_bonus, total_cost_bonus = align_with_stats(cost_bonus, gap_cost=DTW_GAP_PENALTY)
-    metrics_bonus = dtw_metrics_from_score(score_bonus, pairs_bonus, n, m)
-    metrics_bonus["norm_score"] = float(1.0 - (total_cost_bonus / max(1, len_bonus)))
 
+def dtw_score_matrices(similarity: np.ndarray, bonus: np.ndarray) -> np.ndarray:
+    score_bonus = np.clip(DTW_ALPHA_SIM * similarity + DTW_BETA_NUM * bonus, 0.0, 1.0)
     score_gate = np.clip(np.multiply(similarity, bonus), 0.0, 1.0)
-    cost_gate = 1.0 - score_gate
-    pairs_gate, len_gate, total_cost_gate = align_with_stats(cost_gate, gap_cost=DTW_GAP_PENALTY)
-    metrics_gate = dtw_metrics_from_score(score_gate, pairs_gate, n, m)
-    metrics_gate["norm_score"] = float(1.0 - (total_cost_gate / max(1, len_gate)))
+    return np.stack([score_bonus, score_gate])
+
+
+def align_dtw(
+    scores: np.ndarray, band_width: Optional[int] = None
+) -> List[Tuple[List[Tuple[int, int]], int, float]]:
+    if band_width is None:
+        return align_many(1.0 - scores, gap_cost=DTW_GAP_PENALTY)
+    return align_many_banded(1.0 - scores, gap_cost=DTW_GAP_PENALTY, width=band_width)
+
+
+def dtw_metrics_from_scores(
+    scores: np.ndarray,
+    alignments: List[Tuple[List[Tuple[int, int]], int, float]],
+    n: int,
+    m: int,
+    variants: Tuple[str, ...] = DTW_VARIANTS,
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, score, (pairs, path_len, total_cost) in zip(variants, scores, alignments):
+        metrics = dtw_metrics_from_score(score, pairs, n, m)
+        metrics["norm_score"] = float(1.0 - (total_cost / max(1, path_len)))
+        results[name] = metrics
+    return results
 
-    return {"bonus": metrics_bonus, "gate": metrics_gate}
+
+def instance_key(row: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return (str(row.get("topic")), str(row.get("subtopic")), str(row.get("id")), str(row.get("seed")))
+
+
+def text_hash(text: Optional[str]) -> Optional[str]:
+    if not isinstance(text, str):
+        return None
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class MetricFamily(NamedTuple):
+    fields: Tuple[str, ...]
+    needs: Tuple[str, ...]  # intermediates: "embeddings" (step vectors), "agreement" (value matrix)
+    models: Tuple[str, ...]  # keys of MODEL_LOADERS
+
+
+MODEL_LOADERS: Dict[str, Callable[["EvalOptions"], Any]] = {
+    "embedder": lambda options: get_embedder(),
+    "tokenizer": lambda options: get_tokenizer(),
+    "bert": lambda options: get_bert_evaluator(options.bert_num_layers, options.bert_int8),
+    "rouge": lambda options: get_rouge(),
+}
+TORCH_MODELS = {"embedder", "bert"}
+
+# --metrics families. Fields of unselected families are left out of the records.
+METRIC_FAMILIES: Dict[str, MetricFamily] = {
+    "fam": MetricFamily(("final_answer_match",), (), ()),
+    "chaineval-steps": MetricFamily(("recall", "precision"), ("embeddings", "agreement"), ("embedder",)),
+    "rouge": MetricFamily(("rouge2", "rougeL", "rougeLsum"), (), ("rouge",)),
+    "bertscore": MetricFamily(("bertscore",), (), ("tokenizer", "bert")),
+    **{
+        f"dtw-{variant}": MetricFamily(
+            tuple(f"dtw_{name}_{variant}" for name in DTW_METRIC_NAMES), ("embeddings", "agreement"), ("embedder",)
+        )
+        for variant in DTW_VARIANTS
+    },
+    # Torch-free approximations (no embedder): numeric step matching and bag-of-words DTW.
+    "steps-lite": MetricFamily(("recall_lite", "precision_lite"), ("agreement",), ()),
+    "dtw-lite": MetricFamily(tuple(f"dtw_{name}_lite" for name in DTW_METRIC_NAMES), ("agreement",), ()),
+}
+DEFAULT_METRICS = ("fam", "chaineval-steps", "rouge", "bertscore", "dtw-bonus", "dtw-gate")
+# Named selections usable in --metrics; "lite" never imports torch/transformers.
+METRIC_PRESETS: Dict[str, Tuple[str, ...]] = {
+    "full": DEFAULT_METRICS,
+    "lite": ("fam", "steps-lite", "dtw-lite"),
+}
+
+# Record field order; --resume re-scores records missing any selected field.
+RESULT_METRIC_FIELDS = (
+    "recall",
+    "precision",
+    "final_answer_match",
+    "rouge2",
+    "rougeL",
+    "rougeLsum",
+    "bertscore",
+)
+RESULT_METRIC_FIELDS += tuple(f"dtw_{name}_{variant}" for variant in DTW_VARIANTS for name in DTW_METRIC_NAMES)
+RESULT_METRIC_FIELDS += ("recall_lite", "precision_lite") + tuple(f"dtw_{name}_lite" for name in DTW_METRIC_NAMES)
+
+
+def expand_metrics(names: Iterable[str]) -> Tuple[str, ...]:
+    selected: List[str] = []
+    for name in names:
+        for family in METRIC_PRESETS.get(name, (name,)):
+            if family not in selected:
+                selected.append(family)
+    return tuple(selected)
+
+
+def metric_fields(metrics: Iterable[str]) -> Tuple[str, ...]:
+    selected = {name for family in metrics for name in METRIC_FAMILIES[family].fields}
+    return tuple(name for name in RESULT_METRIC_FIELDS if name in selected)
+
+
+def metric_needs(metrics: Iterable[str]) -> set:
+    return {need for family in metrics for need in METRIC_FAMILIES[family].needs}
+
+
+def metric_models(metrics: Iterable[str]) -> set:
+    return {model for family in metrics for model in METRIC_FAMILIES[family].models}
+
+
+def result_key(record: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    return instance_key(record) + (str(record.get("model")),)
 
 
 def build_result_record(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -351,40 +1107,539 @@ def build_result_record(row: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def evaluate_predictions_file(input_path: Path, output_path: Path) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+@dataclass
+class EvalOptions:
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    bert_batch_size: int = BERT_BATCH_SIZE
+    bert_token_budget: int = BERT_TOKEN_BUDGET
+    bert_num_layers: Optional[int] = BERT_NUM_LAYERS
+    bert_int8: bool = BERT_INT8
+    bert_single_pair: bool = False
+    embedding_cache: Optional[EmbeddingCache] = None
+    bert_reference_cache: Optional[ReferenceEmbeddingCache] = None
+    gold_index: Optional["GoldIndex"] = None
+    dtw_band: Optional[int] = DTW_BAND
+    dtw_band_ratio: Optional[float] = DTW_BAND_RATIO
+    resume: bool = False
+    shard: Optional[Tuple[int, int]] = None  # (index, count)
+    pipeline_workers: int = 0  # parse/ROUGE processes; 0 keeps the sequential loop
+    metrics: Tuple[str, ...] = DEFAULT_METRICS
+    result_cache: Optional[ResultCache] = None
+    save_matrices: bool = False
+
+
+def scoring_config(options: EvalOptions) -> Dict[str, Any]:
+    # Everything a metric value depends on; hashed into the result-cache key.
+    return dict(
+        align_threshold=ALIGN_THRESHOLD,
+        value_rel_tol=VALUE_REL_TOL,
+        final_rel_tol=FINAL_REL_TOL,
+        dtw_alpha_sim=DTW_ALPHA_SIM,
+        dtw_beta_num=DTW_BETA_NUM,
+        dtw_sim_accept=DTW_SIM_ACCEPT,
+        dtw_gap_penalty=DTW_GAP_PENALTY,
+        dtw_band=options.dtw_band,
+        dtw_band_ratio=options.dtw_band_ratio,
+        embedder=SENTENCE_EMBEDDER_NAME,
+        embedder_revision=SENTENCE_EMBEDDER_REVISION,
+        bert_model=LONGFORMER_MODEL,
+        bert_num_layers=options.bert_num_layers,
+        bert_int8=options.bert_int8,
+        bert_single_pair=options.bert_single_pair,
+        bert_reference_cache=options.bert_reference_cache is not None,
+        max_tokens=MAX_TOKENS,
+        metrics=sorted(options.metrics),
+    )
 
-    with output_path.open("w", encoding="utf-8") as sink:
-        for row in tqdm(read_jsonl(input_path), desc=input_path.name):
-            metrics = build_result_record(row)
 
-            recall, precision, fam, rouge2, rouge_l, rouge_lsum, bert = score_trace(
-                row.get("solution"), row.get("model_generation")
+def scoring_config_hash(options: EvalOptions) -> str:
+    return hashlib.sha1(json.dumps(scoring_config(options), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def open_result_cache(path: Optional[Path]) -> Optional[ResultCache]:
+    if path is None:
+        return None
+    return ResultCache(path)
+
+
+def result_cache_key(row: Dict[str, Any], config_hash: str) -> Optional[ResultKey]:
+    gold_hash, pred_hash = text_hash(row.get("solution")), text_hash(row.get("model_generation"))
+    if gold_hash is None or pred_hash is None:
+        return None  # nothing to score, nothing worth caching
+    return gold_hash, pred_hash, config_hash
+
+
+def lookup_cached(
+    chunk: List[Dict[str, Any]], options: EvalOptions, config_hash: str
+) -> Dict[int, Dict[str, Any]]:
+    if options.result_cache is None or options.save_matrices:
+        return {}  # --save-matrices needs every row's matrices, so nothing is served from the cache
+    keys = {index: result_cache_key(row, config_hash) for index, row in enumerate(chunk)}
+    hits = options.result_cache.lookup(key for key in keys.values() if key is not None)
+    return {index: hits[key] for index, key in keys.items() if key in hits}
+
+
+def uncached_rows(chunk: List[Dict[str, Any]], cached: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [row for index, row in enumerate(chunk) if index not in cached]
+
+
+def merge_cached(
+    chunk: List[Dict[str, Any]],
+    cached: Dict[int, Dict[str, Any]],
+    scored: List[Dict[str, Any]],
+    options: EvalOptions,
+    config_hash: str,
+) -> List[Dict[str, Any]]:
+    # Put cache hits and freshly scored records back in chunk order; store the fresh ones.
+    fields = metric_fields(options.metrics)
+    records: List[Dict[str, Any]] = []
+    fresh: Dict[ResultKey, Dict[str, Any]] = {}
+    scored_records = iter(scored)
+    for index, row in enumerate(chunk):
+        if index in cached:
+            record = build_result_record(row)
+            record.update(cached[index])
+        else:
+            record = next(scored_records)
+            key = result_cache_key(row, config_hash)
+            if key is not None:
+                fresh[key] = {name: record[name] for name in fields}
+        records.append(record)
+    if options.result_cache is not None:
+        options.result_cache.add(fresh)
+    return records
+
+
+def iter_chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def score_row(
+    row: Dict[str, Any],
+    gold_trace: ParsedTrace,
+    pred_trace: ParsedTrace,
+    bert: Optional[float] = None,
+    options: Optional[EvalOptions] = None,
+    rouge_scores: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    options = options or EvalOptions()
+    metrics = build_result_record(row)
+    gold, pred = row.get("solution"), row.get("model_generation")
+    selected = set(options.metrics)
+    both_text = isinstance(gold, str) and isinstance(pred, str)
+    has_steps = both_text and bool(gold_trace.steps) and bool(pred_trace.steps)
+    # One gold x pred value-agreement matrix feeds both the step mask and the DTW bonus/gate.
+    agreement = None
+    if has_steps and "agreement" in metric_needs(selected):
+        agreement = value_agreement_matrix(gold_trace.values, pred_trace.values)
+
+    values: Dict[str, Any] = {}
+    if "chaineval-steps" in selected:
+        recall, precision = step_recall_precision(gold_trace, pred_trace, agreement) if has_steps else (0.0, 0.0)
+        values.update(recall=recall, precision=precision)
+    if "fam" in selected:
+        values["final_answer_match"] = (
+            final_answer_match(gold_trace.final_value, pred_trace.final_value) if has_steps else 0
+        )
+    if "rouge" in selected:
+        if both_text and rouge_scores is None:
+            rouge_scores = score_rouge(gold, pred, gold_trace.rouge_tokens)
+        for name in ("rouge2", "rougeL", "rougeLsum"):
+            values[name] = rouge_scores[name].fmeasure if both_text else 0.0
+    if "bertscore" in selected:
+        if both_text and bert is None:
+            bert = compute_bert_score(gold, pred, options.bert_num_layers, options.bert_int8)
+        values["bertscore"] = bert if both_text else 0.0
+
+    variants = tuple(variant for variant in DTW_VARIANTS if f"dtw-{variant}" in selected)
+    if variants:
+        dtw = compute_dtw_metrics(
+            gold,
+            pred,
+            gold_trace,
+            pred_trace,
+            band=options.dtw_band,
+            band_ratio=options.dtw_band_ratio,
+            agreement=agreement,
+            variants=variants,
+        )
+        for variant in variants:
+            for name in DTW_METRIC_NAMES:
+                values[f"dtw_{name}_{variant}"] = dtw[variant].get(name, 0.0)
+
+    if "steps-lite" in selected:
+        recall, precision = numeric_step_match(gold_trace, pred_trace, agreement) if has_steps else (0.0, 0.0)
+        values.update(recall_lite=recall, precision_lite=precision)
+    if "dtw-lite" in selected:
+        dtw_lite = dict.fromkeys(DTW_METRIC_NAMES, 0.0)
+        if has_steps:
+            dtw_lite = compute_lite_dtw_metrics(
+                gold_trace, pred_trace, band=options.dtw_band, band_ratio=options.dtw_band_ratio, agreement=agreement
             )
-            dtw = compute_dtw_metrics(row.get("solution"), row.get("model_generation"))
-
-            metrics.update(
-                dict(
-                    recall=recall,
-                    precision=precision,
-                    final_answer_match=fam,
-                    rouge2=rouge2,
-                    rougeL=rouge_l,
-                    rougeLsum=rouge_lsum,
-                    bertscore=bert,
-                    dtw_precision_bonus=dtw["bonus"].get("precision", 0.0),
-                    dtw_recall_bonus=dtw["bonus"].get("recall", 0.0),
-                    dtw_f1_bonus=dtw["bonus"].get("f1", 0.0),
-                    dtw_avg_path_score_bonus=dtw["bonus"].get("avg_path_score", 0.0),
-                    dtw_norm_score_bonus=dtw["bonus"].get("norm_score", 0.0),
-                    dtw_precision_gate=dtw["gate"].get("precision", 0.0),
-                    dtw_recall_gate=dtw["gate"].get("recall", 0.0),
-                    dtw_f1_gate=dtw["gate"].get("f1", 0.0),
-                    dtw_avg_path_score_gate=dtw["gate"].get("avg_path_score", 0.0),
-                    dtw_norm_score_gate=dtw["gate"].get("norm_score", 0.0),
+        for name in DTW_METRIC_NAMES:
+            values[f"dtw_{name}_lite"] = dtw_lite[name]
+
+    metrics.update((name, values[name]) for name in RESULT_METRIC_FIELDS if name in values)
+    return metrics
+
+
+def parse_gold_trace(row: Dict[str, Any], gold_index: Optional["GoldIndex"] = None) -> ParsedTrace:
+    if gold_index is not None:
+        trace = gold_index.lookup(row)
+        if trace is not None:
+            return trace
+    return parse_trace(row.get("solution"))
+
+
+def open_gold_index(path: Optional[Path]) -> Optional["GoldIndex"]:
+    if path is None:
+        return None
+    from gold_index import GoldIndex
+
+    return GoldIndex.load(path)
+
+
+TracePairs = List[Tuple[ParsedTrace, ParsedTrace]]
+
+
+def prepare_chunk(
+    rows: List[Dict[str, Any]], gold_index: Optional["GoldIndex"] = None, metrics: Tuple[str, ...] = DEFAULT_METRICS
+) -> Tuple[TracePairs, List[Optional[Dict[str, Any]]]]:
+    # Model-free work: step parsing, value extraction and ROUGE.
+    traces = [(parse_gold_trace(row, gold_index), parse_trace(row.get("model_generation"))) for row in rows]
+    rouges = []
+    for row, (gold_trace, _) in zip(rows, traces):
+        gold, pred = row.get("solution"), row.get("model_generation")
+        if "rouge" in metrics and isinstance(gold, str) and isinstance(pred, str):
+            rouges.append(score_rouge(gold, pred, gold_trace.rouge_tokens))
+        else:
+            rouges.append(None)
+    return traces, rouges
+
+
+def infer_chunk(rows: List[Dict[str, Any]], traces: TracePairs, options: EvalOptions) -> List[Optional[float]]:
+    if options.save_matrices or "embeddings" in metric_needs(options.metrics):
+        # Only rows where both sides have steps ever reach the embedding-based metrics.
+        embedded = [pair for pair in traces if pair[0].steps and pair[1].steps]
+        embed_traces(
+            [trace for pair in embedded for trace in pair],
+            cache=options.embedding_cache,
+            cached_traces=[gold_trace for gold_trace, _ in embedded],
+        )
+    if "bertscore" not in options.metrics:
+        return [None] * len(rows)
+    return compute_bert_scores(
+        [(row.get("solution"), row.get("model_generation")) for row in rows],
+        batch_size=options.bert_batch_size,
+        token_budget=options.bert_token_budget,
+        num_layers=options.bert_num_layers,
+        int8=options.bert_int8,
+        reference_cache=options.bert_reference_cache,
+        single_pair=options.bert_single_pair,
+    )
+
+
+def finish_chunk(
+    rows: List[Dict[str, Any]],
+    traces: TracePairs,
+    rouges: List[Optional[Dict[str, Any]]],
+    berts: List[Optional[float]],
+    options: EvalOptions,
+    matrices: Optional[MatrixWriter] = None,
+) -> List[Dict[str, Any]]:
+    if matrices is not None:
+        for row, (gold_trace, pred_trace) in zip(rows, traces):
+            save_row_matrices(matrices, row, gold_trace, pred_trace)
+        matrices.sync()  # durable before the chunk's records are written
+    return [
+        score_row(row, gold_trace, pred_trace, bert, options, rouge_scores)
+        for row, (gold_trace, pred_trace), rouge_scores, bert in zip(rows, traces, rouges, berts)
+    ]
+
+
+def save_row_matrices(
+    matrices: MatrixWriter, row: Dict[str, Any], gold_trace: ParsedTrace, pred_trace: ParsedTrace
+) -> None:
+    similarity = agreement = None
+    both_text = isinstance(row.get("solution"), str) and isinstance(row.get("model_generation"), str)
+    if both_text and gold_trace.steps and pred_trace.steps:
+        similarity = pairwise_cosine(ensure_step_embeddings(gold_trace), ensure_step_embeddings(pred_trace))
+        agreement = value_agreement_matrix(gold_trace.values, pred_trace.values)
+    matrices.add(build_result_record(row), similarity, agreement)
+
+
+def score_chunk(
+    rows: List[Dict[str, Any]], options: Optional[EvalOptions] = None, matrices: Optional[MatrixWriter] = None
+) -> List[Dict[str, Any]]:
+    options = options or EvalOptions()
+    traces, rouges = prepare_chunk(rows, options.gold_index, options.metrics)
+    berts = infer_chunk(rows, traces, options)
+    return finish_chunk(rows, traces, rouges, berts, options, matrices)
+
+
+# Set in the parent before the parse pool forks, like _WORKER_OPTIONS below.
+_PREPARE_OPTIONS: Optional[EvalOptions] = None
+
+
+def _init_prepare_worker(options: EvalOptions) -> None:
+    global _PREPARE_OPTIONS
+    _PREPARE_OPTIONS = options
+
+
+def _prepare_in_worker(rows: List[Dict[str, Any]]) -> Tuple[TracePairs, List[Optional[Dict[str, Any]]]]:
+    return prepare_chunk(rows, _PREPARE_OPTIONS.gold_index, _PREPARE_OPTIONS.metrics)
+
+
+def write_records(sink: Any, records: List[Dict[str, Any]]) -> None:
+    # One write + fsync per chunk: after a crash, at most the last line is torn.
+    sink.write("".join(json.dumps(record) + "\n" for record in records))
+    sink.flush()
+    os.fsync(sink.fileno())
+
+
+def run_pipeline(
+    chunks: Iterable[List[Dict[str, Any]]],
+    options: EvalOptions,
+    sink: Any,
+    progress: tqdm,
+    config_hash: str,
+    matrices: Optional[MatrixWriter] = None,
+) -> None:
+    # Three overlapping stages, each holding at most PIPELINE_QUEUE_DEPTH chunks:
+    #   parse + ROUGE     forked process pool, results consumed in submission order
+    #   model inference   this thread; merges chunks whose parsing already finished
+    #   DTW + writing     a separate thread (torch and numpy release the GIL)
+    # Every stage is FIFO, so records come out in input order. Result-cache hits skip
+    # the first three stages and are merged back in by the last one.
+    ready: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    errors: List[BaseException] = []
+
+    def align_stage() -> None:
+        while True:
+            item = ready.get()
+            if item is None:
+                return
+            if errors:
+                continue  # keep draining so the inference stage never blocks on put
+            try:
+                chunk, cached, misses, traces, rouges, berts = item
+                scored = finish_chunk(misses, traces, rouges, berts, options, matrices)
+                write_records(sink, merge_cached(chunk, cached, scored, options, config_hash))
+                progress.update(len(chunk))
+            except BaseException as error:
+                errors.append(error)
+
+    context = multiprocessing.get_context("fork")
+    # Pool forks all workers up front, before the align thread exists.
+    with context.Pool(
+        options.pipeline_workers, initializer=_init_prepare_worker, initargs=(options,)
+    ) as pool:
+        aligner = threading.Thread(target=align_stage, name="chaineval-align", daemon=True)
+        aligner.start()
+        try:
+            pending: Deque[Tuple[Any, ...]] = deque()  # (chunk, cached, misses, async parse result)
+            chunks = iter(chunks)
+            while not errors:
+                while len(pending) < PIPELINE_QUEUE_DEPTH:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    cached = lookup_cached(chunk, options, config_hash)
+                    misses = uncached_rows(chunk, cached)
+                    pending.append((chunk, cached, misses, pool.apply_async(_prepare_in_worker, (misses,))))
+                if not pending:
+                    break
+
+                batch = [pending.popleft()]
+                while pending and pending[0][3].ready() and len(batch) < PIPELINE_MAX_BATCH_CHUNKS:
+                    batch.append(pending.popleft())
+                prepared = [(chunk, cached, misses, *result.get()) for chunk, cached, misses, result in batch]
+                berts = infer_chunk(
+                    [row for _, _, misses, _, _ in prepared for row in misses],
+                    [pair for _, _, _, traces, _ in prepared for pair in traces],
+                    options,
                 )
-            )
-            sink.write(json.dumps(metrics) + "\n")
+                start = 0
+                for chunk, cached, misses, traces, rouges in prepared:
+                    ready.put((chunk, cached, misses, traces, rouges, berts[start : start + len(misses)]))
+                    start += len(misses)
+        finally:
+            ready.put(None)
+            aligner.join()
+    if errors:
+        raise errors[0]
+
+
+def load_completed(output_path: Path, fields: Tuple[str, ...] = RESULT_METRIC_FIELDS) -> Counter:
+    # Count complete records per result key in an earlier (possibly interrupted) output.
+    # A torn final line is cut off; records missing metric fields are dropped so they
+    # get re-scored instead of duplicated.
+    done: Counter = Counter()
+    if not output_path.exists():
+        return done
+    kept: List[bytes] = []
+    valid_bytes = 0
+    dropped = False
+    with output_path.open("rb") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                break
+            valid_bytes += len(line)
+            if all(name in record for name in fields):
+                done[result_key(record)] += 1
+                kept.append(line)
+            else:
+                dropped = True
+
+    if dropped:
+        partial = output_path.with_name(output_path.name + ".tmp")
+        with partial.open("wb") as handle:
+            handle.write(b"".join(kept))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(partial, output_path)
+    elif valid_bytes != output_path.stat().st_size:
+        with output_path.open("rb+") as handle:
+            handle.truncate(valid_bytes)
+    return done
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    index, _, count = spec.partition("/")
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected --shard i/N, got {spec!r}")
+    if not 0 <= shard[0] < shard[1]:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {shard[1]}), got {spec!r}")
+    return shard
+
+
+def shard_of(row: Dict[str, Any], count: int) -> int:
+    # Hash of the instance key, not the line position: the same instance lands on the
+    # same shard in every model file, and shards stay balanced whatever the file order.
+    digest = hashlib.sha1("\0".join(instance_key(row)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_rows(rows: Iterable[Dict[str, Any]], shard: Optional[Tuple[int, int]]) -> Iterable[Dict[str, Any]]:
+    if shard is None:
+        return rows
+    index, count = shard
+    return (row for row in rows if shard_of(row, count) == index)
+
+
+def shard_output_path(output_dir: Path, input_file: Path, shard: Optional[Tuple[int, int]]) -> Path:
+    if shard is None:
+        return output_dir / input_file.name
+    index, count = shard
+    # Kept out of output_dir itself, where every *.jsonl is read as a model's evals.
+    return output_dir / SHARDS_DIR / f"{input_file.stem}.shard-{index}-of-{count}{input_file.suffix}"
+
+
+def pending_rows(rows: Iterable[Dict[str, Any]], done: Counter) -> Iterable[Dict[str, Any]]:
+    for row in rows:
+        key = result_key(row)
+        if done[key] > 0:
+            done[key] -= 1
+            continue
+        yield row
+
+
+def evaluate_predictions_file(
+    input_path: Path, output_path: Path, options: Optional[EvalOptions] = None
+) -> None:
+    options = options or EvalOptions()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    done = load_completed(output_path, metric_fields(options.metrics)) if options.resume else Counter()
+    skipped = sum(done.values())
+
+    rows = pending_rows(shard_rows(read_jsonl(input_path), options.shard), done)
+    mode = "a" if options.resume else "w"
+    config_hash = scoring_config_hash(options)
+    matrices = None
+    if options.save_matrices:
+        keep = done if options.resume else None
+        matrices = MatrixWriter(matrix_path(output_path), keep=keep, key=result_key)
+    try:
+        with output_path.open(mode, encoding="utf-8") as sink, tqdm(desc=input_path.name, initial=skipped) as progress:
+            chunks = iter_chunks(rows, options.chunk_size)
+            if options.pipeline_workers > 0:
+                run_pipeline(chunks, options, sink, progress, config_hash, matrices)
+            else:
+                for chunk in chunks:
+                    cached = lookup_cached(chunk, options, config_hash)
+                    misses = uncached_rows(chunk, cached)
+                    scored = score_chunk(misses, options, matrices) if misses else []
+                    write_records(sink, merge_cached(chunk, cached, scored, options, config_hash))
+                    progress.update(len(chunk))
+        if matrices is not None:
+            matrices.close()
+    finally:
+        if matrices is not None:
+            matrices.release()  # an interrupted run keeps its journal for --resume
+
+
+def preload_models(options: Optional[EvalOptions] = None) -> None:
+    options = options or EvalOptions()
+    for model in sorted(metric_models(options.metrics)):
+        MODEL_LOADERS[model](options)
+
+
+# Set in the parent right before forking so workers inherit the options (and the
+# loaded models) without pickling them.
+_WORKER_OPTIONS: Optional[EvalOptions] = None
+
+
+def _init_worker(threads: int) -> None:
+    if "torch" not in sys.modules:
+        return  # no torch model selected, so none was preloaded
+    import torch
+
+    # Split the cores between workers instead of every worker using all of them.
+    torch.set_num_threads(threads)
+
+
+def _evaluate_in_worker(task: Tuple[Path, Path]) -> Path:
+    input_file, output_file = task
+    evaluate_predictions_file(input_file, output_file, _WORKER_OPTIONS)
+    return output_file
+
+
+def evaluate_many(tasks: List[Tuple[Path, Path]], options: EvalOptions, workers: int = 1) -> None:
+    workers = min(workers, len(tasks))
+    if workers <= 1 or (metric_models(options.metrics) & TORCH_MODELS and get_device() != "cpu"):
+        # CUDA contexts do not survive fork; GPU runs stay serial.
+        for input_file, output_file in tasks:
+            evaluate_predictions_file(input_file, output_file, options)
+        return
+
+    global _WORKER_OPTIONS
+    # Pool workers are daemonic and cannot fork a parse pool of their own.
+    _WORKER_OPTIONS = replace(options, pipeline_workers=0)
+    # Load every model once in the parent; forked workers share the weights copy-on-write.
+    # gc.freeze keeps the collector from touching (and so copying) those objects' pages.
+    preload_models(options)
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    context = multiprocessing.get_context("fork")
+    gc.freeze()
+    try:
+        with context.Pool(workers, initializer=_init_worker, initargs=(max(1, cpus // workers),)) as pool:
+            for _ in pool.imap_unordered(_evaluate_in_worker, tasks):
+                pass
+    finally:
+        gc.unfreeze()
 
 
 def resolve_inputs(path: Path) -> List[Path]:
@@ -409,14 +1664,154 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_OUTPUT_PATH,
         help="Output directory where evaluation files will be written.",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Number of rows whose reasoning steps are embedded in a single batch.",
+    )
+    parser.add_argument(
+        "--bert-batch-size",
+        type=int,
+        default=BERT_BATCH_SIZE,
+        help="Maximum number of gold/prediction pairs per BERTScore forward batch.",
+    )
+    parser.add_argument(
+        "--bert-token-budget",
+        type=int,
+        default=BERT_TOKEN_BUDGET,
+        help="Maximum padded tokens per BERTScore batch; caps --bert-batch-size for long traces.",
+    )
+    parser.add_argument(
+        "--bert-num-layers",
+        type=int,
+        default=BERT_NUM_LAYERS,
+        help="Score BERTScore with the output of this Longformer layer; higher layers are dropped and never run.",
+    )
+    parser.add_argument(
+        "--bert-int8",
+        action="store_true",
+        default=BERT_INT8,
+        help="Dynamically quantize the Longformer linear layers to int8 (CPU only). Check bert_calibration.py "
+        "before using it for leaderboard numbers.",
+    )
+    parser.add_argument(
+        "--bert-single-pair",
+        action="store_true",
+        help="Score BERTScore one pair per call instead of in length-bucketed batches, reproducing the "
+        "unbatched numbers exactly (slower; see bert_calibration.py --check-paths).",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        type=Path,
+        default=None,
+        help="Directory of the on-disk gold step embedding cache shared across runs (disabled if unset).",
+    )
+    parser.add_argument(
+        "--bert-reference-cache",
+        type=Path,
+        default=None,
+        help="Directory of the on-disk BERTScore reference token embedding cache; only candidates are encoded "
+        "for cached gold solutions (disabled if unset).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Evaluate this many prediction files in parallel (forked CPU workers sharing the loaded models).",
+    )
+    parser.add_argument(
+        "--gold-index",
+        type=Path,
+        default=None,
+        help="Gold artifact built by gold_index.py; reference-side parsing, embedding and ROUGE tokenization "
+        "are loaded from it instead of recomputed.",
+    )
+    parser.add_argument(
+        "--dtw-band",
+        type=int,
+        default=DTW_BAND,
+        help="Sakoe-Chiba band half-width (in steps) for DTW; exact DTW if unset.",
+    )
+    parser.add_argument(
+        "--dtw-band-ratio",
+        type=float,
+        default=DTW_BAND_RATIO,
+        help="Sakoe-Chiba band half-width as a fraction of the longer trace; the wider band wins.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Keep complete records already in the output files and only score the missing rows.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help=f"Only score shard i of N (e.g. 0/4), writing {SHARDS_DIR}/<name>.shard-i-of-N.jsonl; "
+        "combine the shards with merge_shards.py.",
+    )
+    parser.add_argument(
+        "--pipeline-workers",
+        type=int,
+        default=0,
+        help="Parse traces and score ROUGE in this many processes while model inference and DTW run in "
+        "their own stages; 0 keeps the sequential loop. Ignored inside --workers processes.",
+    )
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=list(METRIC_FAMILIES) + list(METRIC_PRESETS),
+        default=["full"],
+        help="Metric families (or presets: full, lite) to compute; fields of the other families are left out "
+        "and their models never load. 'lite' is a torch-free pre-filter.",
+    )
+    parser.add_argument(
+        "--result-cache",
+        type=Path,
+        default=None,
+        help="SQLite file of finished metric records keyed by gold/prediction/config hashes; identical "
+        "pairs are read back instead of re-scored (disabled if unset).",
+    )
+    parser.add_argument(
+        "--save-matrices",
+        action="store_true",
+        help="Also write <name>.matrices.npz with each row's float16 step-similarity and value-agreement "
+        "matrices, for threshold_sweep.py. Works with --resume as long as the interrupted run saved them too.",
+    )
     return parser.parse_args()
 
 
+def options_from_args(args: argparse.Namespace) -> EvalOptions:
+    return EvalOptions(
+        chunk_size=args.chunk_size,
+        bert_batch_size=args.bert_batch_size,
+        bert_token_budget=args.bert_token_budget,
+        bert_num_layers=args.bert_num_layers,
+        bert_int8=args.bert_int8,
+        bert_single_pair=args.bert_single_pair,
+        embedding_cache=open_embedding_cache(args.embedding_cache),
+        bert_reference_cache=open_reference_cache(args.bert_reference_cache, args.bert_num_layers, args.bert_int8),
+        gold_index=open_gold_index(args.gold_index),
+        dtw_band=args.dtw_band,
+        dtw_band_ratio=args.dtw_band_ratio,
+        resume=args.resume,
+        shard=args.shard,
+        pipeline_workers=args.pipeline_workers,
+        metrics=expand_metrics(args.metrics),
+        result_cache=open_result_cache(args.result_cache),
+        save_matrices=args.save_matrices,
+    )
+
+
 def main() -> None:
     args = parse_args()
-    for input_file in resolve_inputs(args.input):
-        output_file = args.output / input_file.name
-        evaluate_predictions_file(input_file, output_file)
+    options = options_from_args(args)
+    tasks = [
+        (input_file, shard_output_path(args.output, input_file, options.shard))
+        for input_file in resolve_inputs(args.input)
+    ]
+    evaluate_many(tasks, options, workers=args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from evaluate_predictions import (
+    DEFAULT_CHUNK_SIZE,
+    SENTENCE_EMBEDDER_NAME,
+    SENTENCE_EMBEDDER_REVISION,
+    ParsedTrace,
+    embed_traces,
+    instance_key,
+    iter_chunks,
+    parse_trace,
+    read_jsonl,
+    rouge_reference_tokens,
+    text_hash,
+)
+
+
+# Precomputed gold-side artifacts for the benchmark, so ChainEval never re-parses,
+# re-embeds or re-tokenizes reference solutions per model file. A gold index directory:
+#   meta.json        embedder name/revision, embedding dim, number of instances
+#   records.jsonl    one record per (topic, subtopic, id, seed): solution hash, steps,
+#                    step values, final value, ROUGE tokens and an embedding row offset
+#   embeddings.f32   float32 step embeddings of all records, loaded with np.memmap
+# Records whose solution hash differs from the row being scored are ignored, and that
+# row falls back to live computation.
+DEFAULT_GOLD_INDEX_PATH = Path("gold_index")
+GOLD_INDEX_VERSION = 1
+
+
+def benchmark_rows(path: Path) -> Iterable[Dict[str, Any]]:
+    # Testset files (testset/<topic>/<subtopic>.jsonl) carry no topic/subtopic fields.
+    files = sorted(path.rglob("*.jsonl")) if path.is_dir() else [path]
+    for file in files:
+        for row in read_jsonl(file):
+            row.setdefault("topic", file.parent.name)
+            row.setdefault("subtopic", file.stem)
+            yield row
+
+
+def build_gold_index(input_path: Path, output_dir: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    seen = set()
+    offset = 0
+    dim = None
+    with (output_dir / "records.jsonl").open("w", encoding="utf-8") as records, (
+        output_dir / "embeddings.f32"
+    ).open("wb") as embeddings:
+        for chunk in tqdm(iter_chunks(benchmark_rows(input_path), chunk_size), desc="gold index"):
+            rows = []
+            for row in chunk:
+                key = instance_key(row)
+                if key in seen or not isinstance(row.get("solution"), str):
+                    continue
+                seen.add(key)
+                rows.append(row)
+            traces = [parse_trace(row["solution"]) for row in rows]
+            embed_traces(traces)
+
+            for row, trace in zip(rows, traces):
+                if trace.steps:
+                    vectors = np.asarray(trace.embeddings, dtype=np.float32)
+                    dim = vectors.shape[1]
+                    embeddings.write(vectors.tobytes())
+                topic, subtopic, instance_id, seed = instance_key(row)
+                record = dict(
+                    topic=topic,
+                    subtopic=subtopic,
+                    id=instance_id,
+                    seed=seed,
+                    solution_hash=text_hash(row["solution"]),
+                    steps=trace.steps,
+                    values=trace.values,
+                    final_value=trace.final_value,
+                    rouge_tokens=rouge_reference_tokens(row["solution"]),
+                    embedding_offset=offset,
+                )
+                records.write(json.dumps(record) + "\n")
+                offset += len(trace.steps)
+
+    meta = dict(
+        version=GOLD_INDEX_VERSION,
+        embedder=SENTENCE_EMBEDDER_NAME,
+        revision=SENTENCE_EMBEDDER_REVISION,
+        dim=dim,
+        rows=offset,
+        instances=len(seen),
+    )
+    (output_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    return len(seen)
+
+
+class GoldIndex:
+    def __init__(
+        self,
+        records: Dict[Tuple[str, str, str, str], Dict[str, Any]],
+        embeddings: Optional[np.ndarray],
+    ) -> None:
+        self.records = records
+        self.embeddings = embeddings
+
+    @classmethod
+    def load(cls, directory: Path) -> "GoldIndex":
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != GOLD_INDEX_VERSION:
+            raise ValueError(f"Unsupported gold index version {meta.get('version')} in {directory}")
+
+        records = {}
+        for record in read_jsonl(directory / "records.jsonl"):
+            records[(record["topic"], record["subtopic"], record["id"], record["seed"])] = record
+
+        embeddings = None
+        # Embeddings from another sentence model are unusable; steps/values/tokens still are.
+        same_model = meta["embedder"] == SENTENCE_EMBEDDER_NAME and meta["revision"] == SENTENCE_EMBEDDER_REVISION
+        if same_model and meta["rows"] and meta["dim"]:
+            embeddings = np.memmap(
+                directory / "embeddings.f32", dtype=np.float32, mode="r", shape=(meta["rows"], meta["dim"])
+            )
+        return cls(records, embeddings)
+
+    def lookup(self, row: Dict[str, Any]) -> Optional[ParsedTrace]:
+        record = self.records.get(instance_key(row))
+        if record is None or record["solution_hash"] != text_hash(row.get("solution")):
+            return None
+
+        steps: List[str] = record["steps"]
+        embeddings = None
+        if self.embeddings is not None and steps:
+            start = record["embedding_offset"]
+            embeddings = np.asarray(self.embeddings[start : start + len(steps)])
+        tokens, lines = record["rouge_tokens"]
+        return ParsedTrace(
+            steps=steps,
+            values=record["values"],
+            final_value=record["final_value"],
+            embeddings=embeddings,
+            rouge_tokens=(tokens, lines),
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the ChainEval gold-side artifact index.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        required=True,
+        help="Benchmark testset directory, or a .jsonl file with solution/topic/subtopic/id/seed fields.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_GOLD_INDEX_PATH,
+        help="Directory where the gold index will be written.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    count = build_gold_index(args.input, args.output, chunk_size=args.chunk_size)
+    print(f"Indexed {count} gold instances into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
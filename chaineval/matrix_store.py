@@ -0,0 +1,141 @@
+import json
+import os
+import zipfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+# Per-row step matrices saved by `evaluate_predictions.py --save-matrices`, so alignment
+# thresholds can be re-tuned without re-running the models (see threshold_sweep.py).
+# One archive per output file, <name>.matrices.npz (np.load can open it):
+#   rows.json       one entry per scored row: the record identity fields plus n_gold/n_pred
+#   sim_<i>.npy     float16 (n_gold, n_pred) cosine similarity of the step embeddings
+#   agree_<i>.npy   float16 (n_gold, n_pred) value-agreement matrix
+# Rows without steps on both sides only have their rows.json entry.
+# While a run is in progress the rows go to <name>.matrices.journal instead: per row, its
+# rows.json entry as one JSON line followed by the raw similarity and agreement bytes.
+# The journal is fsynced before each chunk's records are written, so every record that
+# survives a crash has its matrices; the archive is packed from it once the run completes.
+MATRIX_DTYPE = np.float16
+
+RowMatrices = Tuple[Dict[str, Any], Optional[np.ndarray], Optional[np.ndarray]]
+
+
+def matrix_path(output_path: Path) -> Path:
+    return output_path.with_name(f"{output_path.stem}.matrices.npz")
+
+
+def journal_path(path: Path) -> Path:
+    return path.with_name(path.name[: -len(".npz")] + ".journal")
+
+
+def read_journal(path: Path) -> Iterator[RowMatrices]:
+    # Stops at a torn final entry from an interrupted run.
+    with path.open("rb") as handle:
+        for line in handle:
+            try:
+                row = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                return
+            if not row["n_gold"] or not row["n_pred"]:
+                yield row, None, None
+                continue
+            shape = (row["n_gold"], row["n_pred"])
+            count = shape[0] * shape[1]
+            data = handle.read(2 * count * np.dtype(MATRIX_DTYPE).itemsize)
+            matrices = np.frombuffer(data, dtype=MATRIX_DTYPE)
+            if len(matrices) < 2 * count:
+                return
+            yield row, matrices[:count].reshape(shape), matrices[count:].reshape(shape)
+
+
+class MatrixWriter:
+    def __init__(
+        self,
+        path: Path,
+        keep: Optional[Counter] = None,
+        key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ) -> None:
+        # keep (for --resume): result keys of the records already in the output, counted
+        # as key(record). The rows of an interrupted run's journal, or else of a finished
+        # run's archive, are carried over for exactly those records; records that were
+        # dropped from the output lose their matrices and are re-added when re-scored.
+        self.path = path
+        self.journal_path = journal_path(path)
+        partial = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        self.journal = partial.open("wb")
+        if keep:
+            previous: Iterable[RowMatrices] = []
+            if self.journal_path.exists():
+                previous = read_journal(self.journal_path)
+            elif path.exists():
+                previous = read_matrices(path)
+            remaining = Counter(keep)
+            for row, similarity, agreement in previous:
+                if remaining[key(row)] > 0:
+                    remaining[key(row)] -= 1
+                    self.add(row, similarity, agreement)
+            missing = sum(remaining.values())
+            if missing:
+                self.journal.close()
+                partial.unlink()
+                raise ValueError(
+                    f"{path}: no saved matrices for {missing} of the {sum(keep.values())} records already in the "
+                    "output; rerun without --resume to rebuild them"
+                )
+        self.sync()
+        os.replace(partial, self.journal_path)
+
+    def add(self, record: Dict[str, Any], similarity: Optional[np.ndarray], agreement: Optional[np.ndarray]) -> None:
+        n_gold, n_pred = similarity.shape if similarity is not None else (0, 0)
+        row = dict(record, n_gold=int(n_gold), n_pred=int(n_pred))
+        self.journal.write((json.dumps(row) + "\n").encode("utf-8"))
+        if similarity is not None:
+            self.journal.write(np.ascontiguousarray(similarity, dtype=MATRIX_DTYPE).tobytes())
+            self.journal.write(np.ascontiguousarray(agreement, dtype=MATRIX_DTYPE).tobytes())
+
+    def sync(self) -> None:
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def release(self) -> None:
+        # Leaves the journal in place for --resume.
+        if not self.journal.closed:
+            self.journal.close()
+
+    def close(self) -> None:
+        # Packs the journal of a completed run into the archive.
+        self.release()
+        partial = self.path.with_name(self.path.name + ".tmp")
+        rows: List[Dict[str, Any]] = []
+        with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for index, (row, similarity, agreement) in enumerate(read_journal(self.journal_path)):
+                rows.append(row)
+                if similarity is not None:
+                    for name, array in ((f"sim_{index}.npy", similarity), (f"agree_{index}.npy", agreement)):
+                        with archive.open(name, "w") as handle:
+                            np.lib.format.write_array(handle, array, allow_pickle=False)
+            archive.writestr("rows.json", json.dumps(rows))
+        with partial.open("rb") as handle:
+            os.fsync(handle.fileno())
+        os.replace(partial, self.path)
+        self.journal_path.unlink()
+
+
+def read_matrices(path: Path) -> Iterable[RowMatrices]:
+    with zipfile.ZipFile(path) as archive:
+        rows = json.loads(archive.read("rows.json"))
+        for index, row in enumerate(rows):
+            if not row["n_gold"] or not row["n_pred"]:
+                yield row, None, None
+                continue
+            with archive.open(f"sim_{index}.npy") as handle:
+                similarity = np.lib.format.read_array(handle)
+            with archive.open(f"agree_{index}.npy") as handle:
+                agreement = np.lib.format.read_array(handle)
+            yield row, similarity, agreement
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from evaluate_predictions import (
+    DEFAULT_INPUT_PATH,
+    DEFAULT_OUTPUT_PATH,
+    METRIC_FAMILIES,
+    METRIC_PRESETS,
+    RESULT_METRIC_FIELDS,
+    SHARDS_DIR,
+    expand_metrics,
+    metric_fields,
+    read_jsonl,
+    resolve_inputs,
+    result_key,
+    shard_of,
+    shard_output_path,
+)
+
+
+# Stitches `evaluate_predictions.py --shard i/N` outputs back into the canonical
+# <model>.jsonl files. The prediction file is the source of truth for coverage: every
+# row must have exactly one complete record in the shard it hashes to, or nothing is written.
+MAX_REPORTED_PROBLEMS = 20
+
+
+def read_shard(path: Path) -> List[Dict[str, Any]]:
+    try:
+        return list(read_jsonl(path))
+    except ValueError as error:
+        raise ValueError(f"{path} has a torn or corrupt line ({error}); rerun that shard with --resume") from error
+
+
+def collect_shards(
+    input_file: Path, output_dir: Path, count: int, fields: Tuple[str, ...] = RESULT_METRIC_FIELDS
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    problems: List[str] = []
+    shard_paths = [shard_output_path(output_dir, input_file, (index, count)) for index in range(count)]
+    problems += [f"missing shard file {path}" for path in shard_paths if not path.exists()]
+    if problems:
+        return [], problems
+
+    records: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+    for index, path in enumerate(shard_paths):
+        for record in read_shard(path):
+            if shard_of(record, count) != index:
+                problems.append(f"{path.name}: {result_key(record)} belongs to shard {shard_of(record, count)}")
+            elif not all(name in record for name in fields):
+                problems.append(f"{path.name}: incomplete record for {result_key(record)}")
+            else:
+                records[result_key(record)].append(record)
+
+    merged = []
+    for row in read_jsonl(input_file):
+        matches = records.get(result_key(row))
+        if matches:
+            merged.append(matches.pop(0))
+        else:
+            problems.append(f"gap: no record for {result_key(row)}")
+    leftovers = Counter({key: len(rest) for key, rest in records.items() if rest})
+    problems += [f"duplicate or unexpected record x{n} for {key}" for key, n in leftovers.items()]
+    return merged, problems
+
+
+def write_merged(records: List[Dict[str, Any]], output_path: Path) -> None:
+    partial = output_path.with_name(output_path.name + ".tmp")
+    with partial.open("w", encoding="utf-8") as sink:
+        sink.write("".join(json.dumps(record) + "\n" for record in records))
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(partial, output_path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate and merge sharded ChainEval outputs.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT_PATH,
+        help="The prediction .jsonl file or directory that was sharded.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT_PATH,
+        help=f"Evaluation directory of the sharded run; shards are read from its {SHARDS_DIR}/ and the merged "
+        "<name>.jsonl files are written to it.",
+    )
+    parser.add_argument("--shards", type=int, required=True, help="Number of shards N the run was split into.")
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=list(METRIC_FAMILIES) + list(METRIC_PRESETS),
+        default=["full"],
+        help="Metric families the shards were scored with; records missing their fields count as gaps.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    failed = False
+    for input_file in resolve_inputs(args.input):
+        records, problems = collect_shards(input_file, args.output, args.shards, metric_fields(expand_metrics(args.metrics)))
+        if problems:
+            failed = True
+            print(f"{input_file.name}: {len(problems)} problem(s), not merged")
+            for problem in problems[:MAX_REPORTED_PROBLEMS]:
+                print(f"  {problem}")
+            continue
+        write_merged(records, args.output / input_file.name)
+        print(f"{input_file.name}: merged {len(records)} records from {args.shards} shards")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import json
+import math
+import re
+from pathlib import Path
+from typing import Dict, List
+
+from aggregate import (
+    DEFAULT_EVALS_DIR,
+    METRIC_COLUMNS,
+    SUMMARY_SUFFIX,
+    Summary,
+    read_summary,
+    summary_model_file,
+    summary_path,
+    write_outputs,
+    write_summary,
+)
+
+
+# Combines the <model>.summary.json.gz files written by aggregate.py on any number of
+# shards or machines into the usual tables (mean_sdv_results.txt and the *_wise pickles)
+# without reading evals rows. Summaries of `--shard i/N` outputs (aggregate.py run on the
+# shards/ directory of a sharded run) fold into their model.
+QUANTILE_RESULTS_FILE = "quantile_results.json"
+SHARD_SUFFIX = re.compile(r"\.shard-\d+-of-\d+(?=\.jsonl$)")
+
+
+def resolve_summaries(paths: List[Path]) -> List[Path]:
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files += sorted(path.glob(f"*{SUMMARY_SUFFIX}"))
+        elif path.is_file():
+            files.append(path)
+        else:
+            raise ValueError(f"No summary files found for input path: {path}")
+    return files
+
+
+def merge_summaries(paths: List[Path]) -> Dict[str, Summary]:
+    merged: Dict[str, Summary] = {}
+    for path in paths:
+        model_file = SHARD_SUFFIX.sub("", summary_model_file(path))
+        summary = read_summary(path)
+        if model_file in merged:
+            merged[model_file].merge(summary)
+        else:
+            merged[model_file] = summary
+    return merged
+
+
+def quantile_records(summaries: Dict[str, Summary], qs: List[float]) -> List[Dict[str, object]]:
+    records = []
+    for model_file, summary in summaries.items():
+        for grouping, groups in summary.quantiles(qs).items():
+            for group, values in groups.items():
+                for metric, row in zip(METRIC_COLUMNS, values.tolist()):
+                    if all(math.isnan(value) for value in row):
+                        continue  # metric not scored for this model
+                    records.append(
+                        dict(model=model_file, grouping=grouping, group=group, metric=metric, quantiles=dict(zip(map(str, qs), row)))
+                    )
+    return records
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Merge aggregate.py summaries into the final ChainEval tables.")
+    parser.add_argument(
+        "--inputs",
+        type=Path,
+        nargs="+",
+        required=True,
+        help=f"{SUMMARY_SUFFIX} files or directories of them, e.g. one per machine.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_EVALS_DIR,
+        help="Directory for the merged tables and the merged per-model summaries.",
+    )
+    parser.add_argument(
+        "--quantiles",
+        type=float,
+        nargs="*",
+        default=[0.1, 0.25, 0.5, 0.75, 0.9],
+        help=f"Quantiles estimated from the t-digests into {QUANTILE_RESULTS_FILE} (none skips the file).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    summaries = merge_summaries(resolve_summaries(args.inputs))
+    args.output.mkdir(parents=True, exist_ok=True)
+    for model_file, summary in summaries.items():
+        write_summary(summary, summary_path(args.output, model_file))
+    write_outputs(
+        args.output,
+        {model_file: summary.tables() for model_file, summary in summaries.items()},
+        {model_file: summary.group_sizes() for model_file, summary in summaries.items()},
+    )
+    if args.quantiles:
+        with (args.output / QUANTILE_RESULTS_FILE).open("w", encoding="utf-8") as handle:
+            json.dump(quantile_records(summaries, args.quantiles), handle, indent=1)
+    print(f"merged {len(summaries)} model(s) into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
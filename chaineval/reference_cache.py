@@ -0,0 +1,136 @@
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_cache import model_slug
+
+
+# On-disk store of BERTScore reference statistics: the contextual token embeddings of a
+# gold solution (one row per token, already cut to the scored layer) and their idf
+# weights, exactly what bert_score keeps per sentence before greedy matching.
+# Layout of one cache directory (one per model + layer/quantization setting):
+#   meta.json     model, setting, embedding dim
+#   vectors.f32   float32 (tokens, dim) rows of all cached texts, appended
+#   idf.f32       float32 idf weight per row of vectors.f32
+#   index.tsv     "<key>\t<first row>\t<n rows>"; a key hashes (model, setting, text)
+# Data is written before its index line, so the index never points past the data.
+CACHE_DTYPE = np.float32
+
+ReferenceStats = Tuple[np.ndarray, np.ndarray]  # (tokens, dim) embeddings, (tokens,) idf
+
+
+def reference_key(model_name: str, setting: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{setting}\0{text}".encode("utf-8")).hexdigest()
+
+
+class ReferenceEmbeddingCache:
+    def __init__(self, root: Path, model_name: str, setting: str) -> None:
+        self.model_name = model_name
+        self.setting = setting
+        self.directory = Path(root) / model_slug(model_name, setting.replace("/", "-"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.directory / "meta.json"
+        self.vectors_path = self.directory / "vectors.f32"
+        self.idf_path = self.directory / "idf.f32"
+        self.index_path = self.directory / "index.tsv"
+        self.lock_path = self.directory / ".lock"
+
+        self.dim: Optional[int] = None
+        if self.meta_path.exists():
+            self.dim = json.loads(self.meta_path.read_text(encoding="utf-8"))["dim"]
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._index_offset = 0
+        self._read_index()
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def _read_index(self) -> None:
+        if not self.index_path.exists():
+            return
+        with self.index_path.open("rb") as handle:
+            handle.seek(self._index_offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # torn write from an interrupted run
+                self._index_offset += len(line)
+                parts = line.decode("utf-8").rstrip("\n").split("\t")
+                if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+                    self._spans.setdefault(parts[0], (int(parts[1]), int(parts[2])))
+
+    def _stored_rows(self) -> int:
+        if self.dim is None or not self.vectors_path.exists() or not self.idf_path.exists():
+            return 0
+        vector_rows = self.vectors_path.stat().st_size // (self.dim * np.dtype(CACHE_DTYPE).itemsize)
+        idf_rows = self.idf_path.stat().st_size // np.dtype(CACHE_DTYPE).itemsize
+        return min(vector_rows, idf_rows)
+
+    def lookup(self, texts: Iterable[str]) -> Dict[str, ReferenceStats]:
+        keys = {text: reference_key(self.model_name, self.setting, text) for text in texts}
+        hits = {text: self._spans[key] for text, key in keys.items() if key in self._spans}
+        if not hits:
+            return {}
+        n_rows = max(start + length for start, length in hits.values())
+        vectors = np.memmap(self.vectors_path, dtype=CACHE_DTYPE, mode="r", shape=(n_rows, self.dim))
+        idf = np.memmap(self.idf_path, dtype=CACHE_DTYPE, mode="r", shape=(n_rows,))
+        return {
+            text: (np.array(vectors[start : start + length]), np.array(idf[start : start + length]))
+            for text, (start, length) in hits.items()
+        }
+
+    def add(self, stats: Dict[str, ReferenceStats]) -> None:
+        if not stats:
+            return
+        with self.lock_path.open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Pick up texts appended by concurrent writers before allocating rows.
+            self._read_index()
+            pending: Dict[str, ReferenceStats] = {}
+            for text, (vectors, idf) in stats.items():
+                key = reference_key(self.model_name, self.setting, text)
+                if key not in self._spans and key not in pending:
+                    pending[key] = (np.asarray(vectors, dtype=CACHE_DTYPE), np.asarray(idf, dtype=CACHE_DTYPE))
+            if not pending:
+                return
+
+            dims = {vectors.shape[1] for vectors, _ in pending.values()}
+            if self.dim is None:
+                self.dim = int(dims.pop())
+                self.meta_path.write_text(
+                    json.dumps(dict(model=self.model_name, setting=self.setting, dim=self.dim, dtype="float32")),
+                    encoding="utf-8",
+                )
+            if dims - {self.dim}:
+                raise ValueError(f"Token embedding dims {sorted(dims)} do not match cache dim {self.dim}")
+
+            start = self._stored_rows()
+            lines: List[str] = []
+            row = start
+            for key, (vectors, _) in pending.items():
+                lines.append(f"{key}\t{row}\t{len(vectors)}\n")
+                row += len(vectors)
+            for path, blobs in (
+                (self.vectors_path, [vectors.tobytes() for vectors, _ in pending.values()]),
+                (self.idf_path, [idf.tobytes() for _, idf in pending.values()]),
+            ):
+                row_bytes = (self.dim if path == self.vectors_path else 1) * np.dtype(CACHE_DTYPE).itemsize
+                with path.open("ab") as handle:
+                    handle.truncate(start * row_bytes)  # drop rows of a torn earlier write
+                    handle.write(b"".join(blobs))
+                    handle.flush()
+                    os.fsync(handle.fileno())
+
+            with self.index_path.open("a", encoding="utf-8") as handle:
+                handle.truncate(self._index_offset)  # drop a torn trailing line
+                handle.write("".join(lines))
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._index_offset = self.index_path.stat().st_size
+            for line in lines:
+                key, first, length = line.rstrip("\n").split("\t")
+                self._spans[key] = (int(first), int(length))
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+# SQLite store of finished metric records shared across evaluation runs. A key is
+# (sha1 of the gold text, sha1 of the prediction, hash of the scoring configuration),
+# the value the JSON of the record's metric fields. Rows are never updated: a changed
+# constant or model produces a different configuration hash, hence new keys.
+ResultKey = Tuple[str, str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    gold_hash TEXT NOT NULL,
+    pred_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (gold_hash, pred_hash, config_hash)
+) WITHOUT ROWID
+"""
+
+
+class ResultCache:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # Create the schema now, but only hold connections lazily: they must not cross fork().
+        connection = sqlite3.connect(self.path, timeout=60.0)
+        with connection:
+            connection.execute(SCHEMA)
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60.0, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._connection
+
+    def lookup(self, keys: Iterable[ResultKey]) -> Dict[ResultKey, Dict[str, Any]]:
+        hits: Dict[ResultKey, Dict[str, Any]] = {}
+        with self._lock:
+            connection = self._connect()
+            for key in set(keys):
+                found = connection.execute(
+                    "SELECT metrics FROM results WHERE gold_hash = ? AND pred_hash = ? AND config_hash = ?", key
+                ).fetchone()
+                if found is not None:
+                    hits[key] = json.loads(found[0])
+        return hits
+
+    def add(self, results: Dict[ResultKey, Dict[str, Any]]) -> None:
+        if not results:
+            return
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                    [(*key, json.dumps(metrics)) for key, metrics in results.items()],
+                )
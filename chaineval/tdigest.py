@@ -0,0 +1,101 @@
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Merging t-digest (Dunning & Ertl) with the k1 scale function: approximate quantiles of a
+# stream in O(compression) memory, and digests of disjoint streams merge into the digest
+# of their union. Values are buffered and folded into the centroids in sorted batches.
+TDIGEST_COMPRESSION = 100.0
+TDIGEST_BUFFER_FACTOR = 5
+
+
+def k_scale(q: float, compression: float) -> float:
+    return compression / (2.0 * math.pi) * math.asin(2.0 * min(max(q, 0.0), 1.0) - 1.0)
+
+
+class TDigest:
+    def __init__(self, compression: float = TDIGEST_COMPRESSION) -> None:
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = float("inf")
+        self.max = float("-inf")
+        self._buffer: List[float] = []
+
+    @property
+    def count(self) -> float:
+        self._compress()
+        return float(self.weights.sum())
+
+    def add(self, value: float) -> None:
+        self.add_many(np.array([value], dtype=float))
+
+    def add_many(self, values: np.ndarray) -> None:
+        self._buffer.extend(values[~np.isnan(values)].tolist())  # NaN carries no rank information
+        if len(self._buffer) >= TDIGEST_BUFFER_FACTOR * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress(other.means, other.weights)
+
+    def _compress(self, extra_means: np.ndarray = np.zeros(0), extra_weights: np.ndarray = np.zeros(0)) -> None:
+        if not self._buffer and not len(extra_means):
+            return
+        buffered = np.asarray(self._buffer, dtype=float)
+        self._buffer = []
+        if len(buffered):
+            self.min, self.max = min(self.min, float(buffered.min())), max(self.max, float(buffered.max()))
+        means = np.concatenate([self.means, buffered, extra_means])
+        weights = np.concatenate([self.weights, np.ones(len(buffered)), extra_weights])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        merged_means, merged_weights = [], []
+        mean, weight, done = means[0], weights[0], 0.0
+        k_lower = k_scale(0.0, self.compression)
+        for next_mean, next_weight in zip(means[1:], weights[1:]):
+            if k_scale((done + weight + next_weight) / total, self.compression) - k_lower <= 1.0:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged_means.append(mean)
+                merged_weights.append(weight)
+                done += weight
+                k_lower = k_scale(done / total, self.compression)
+                mean, weight = next_mean, next_weight
+        merged_means.append(mean)
+        merged_weights.append(weight)
+        self.means, self.weights = np.array(merged_means), np.array(merged_weights)
+
+    def quantile(self, q: float) -> float:
+        # Interpolates between centroid centers, anchored at the exact min and max.
+        self._compress()
+        if not len(self.means):
+            return float("nan")
+        centers = np.cumsum(self.weights) - self.weights / 2.0
+        xs = np.concatenate([[0.0], centers, [self.weights.sum()]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * self.weights.sum(), xs, ys))
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._compress()
+        return dict(
+            compression=self.compression,
+            min=self.min if len(self.means) else None,
+            max=self.max if len(self.means) else None,
+            means=self.means.tolist(),
+            weights=self.weights.tolist(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls(data["compression"])
+        digest.means = np.asarray(data["means"], dtype=float)
+        digest.weights = np.asarray(data["weights"], dtype=float)
+        if len(digest.means):
+            digest.min, digest.max = data["min"], data["max"]
+        return digest
@@ -0,0 +1,179 @@
+import argparse
+import itertools
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from evaluate_predictions import (
+    ALIGN_THRESHOLD,
+    DEFAULT_OUTPUT_PATH,
+    DTW_ALPHA_SIM,
+    DTW_BETA_NUM,
+    DTW_GAP_PENALTY,
+    DTW_SIM_ACCEPT,
+    align_many,
+    dtw_metrics_from_score,
+)
+from matrix_store import read_matrices
+
+
+# Re-scores step recall/precision and DTW over a grid of alignment constants using the
+# matrices saved by `evaluate_predictions.py --save-matrices`; no model is loaded.
+# Matrices are float16, so values can differ from a full run in the last digits.
+DTW_KEYS = ("precision", "recall", "f1", "avg_path_score", "norm_score")
+REPORT_COLUMNS = ("recall", "precision", "dtw_f1_bonus", "dtw_norm_score_bonus", "dtw_f1_gate", "dtw_norm_score_gate")
+
+Matrices = Tuple[np.ndarray, np.ndarray]
+
+
+def resolve_matrix_files(path: Path) -> List[Path]:
+    if path.is_dir():
+        return sorted(path.glob("*.matrices.npz"))
+    if path.is_file():
+        return [path]
+    raise ValueError(f"No .matrices.npz files found for input path: {path}")
+
+
+def load_rows(paths: List[Path]) -> Tuple[int, List[Matrices]]:
+    # Rows without steps score zero everywhere; they only count towards the mean.
+    total, rows = 0, []
+    for path in paths:
+        for _, similarity, agreement in read_matrices(path):
+            total += 1
+            if similarity is not None:
+                rows.append((similarity.astype(np.float32), agreement.astype(np.float32)))
+    return total, rows
+
+
+def step_sweep(rows: List[Matrices], thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Summed recall and precision per threshold, all rows at once: the per-step best
+    # masked similarities are concatenated and counted per row with np.add.reduceat.
+    if not rows:
+        return np.zeros(len(thresholds)), np.zeros(len(thresholds))
+    sums = []
+    for axis in (1, 0):
+        best = [np.max(similarity * agreement, axis=axis) for similarity, agreement in rows]
+        sizes = np.array([len(values) for values in best])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        hits = (np.concatenate(best)[None, :] > thresholds[:, None]).astype(np.int64)
+        sums.append((np.add.reduceat(hits, starts, axis=1) / sizes).sum(axis=1))
+    return sums[0], sums[1]
+
+
+def dtw_sweep(
+    rows: List[Matrices],
+    weights: List[Tuple[float, float]],
+    gaps: List[float],
+    accepts: List[float],
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Summed DTW metrics, shape (weights, gaps, accepts, DTW_KEYS) for the bonus score and
+    # (gaps, accepts, DTW_KEYS) for the gate score. Rows of one (n, m) shape are stacked
+    # with every weight setting and aligned in a single align_many call per gap penalty.
+    bonus_sums = np.zeros((len(weights), len(gaps), len(accepts), len(DTW_KEYS)))
+    gate_sums = np.zeros((len(gaps), len(accepts), len(DTW_KEYS)))
+    by_shape: Dict[Tuple[int, int], List[Matrices]] = defaultdict(list)
+    for similarity, agreement in rows:
+        by_shape[similarity.shape].append((similarity, agreement))
+
+    for (n, m), group in tqdm(by_shape.items(), desc="dtw"):
+        similarity = np.clip(np.stack([sim for sim, _ in group]), 0.0, 1.0)
+        agreement = np.stack([agree for _, agree in group])
+        scores = [np.clip(alpha * similarity + beta * agreement, 0.0, 1.0) for alpha, beta in weights]
+        scores.append(np.clip(similarity * agreement, 0.0, 1.0))
+        stack = np.concatenate(scores)
+        for g, gap in enumerate(gaps):
+            alignments = align_many(1.0 - stack, gap_cost=gap)
+            for k, (pairs, path_len, total_cost) in enumerate(alignments):
+                setting, _ = divmod(k, len(group))
+                sums = gate_sums[g] if setting == len(weights) else bonus_sums[setting, g]
+                norm_score = 1.0 - total_cost / max(1, path_len)
+                for a, accept in enumerate(accepts):
+                    metrics = dtw_metrics_from_score(stack[k], pairs, n, m, accept)
+                    metrics["norm_score"] = norm_score
+                    sums[a] += [metrics[key] for key in DTW_KEYS]
+    return bonus_sums, gate_sums
+
+
+def sweep(
+    total: int,
+    rows: List[Matrices],
+    thresholds: List[float],
+    weights: List[Tuple[float, float]],
+    gaps: List[float],
+    accepts: List[float],
+) -> List[Dict[str, float]]:
+    recall, precision = step_sweep(rows, np.asarray(thresholds, dtype=np.float32))
+    bonus, gate = dtw_sweep(rows, weights, gaps, accepts)
+    total = max(1, total)
+    f1, norm = DTW_KEYS.index("f1"), DTW_KEYS.index("norm_score")
+
+    table = []
+    for (t, threshold), (w, (alpha, beta)), (g, gap), (a, accept) in itertools.product(
+        enumerate(thresholds), enumerate(weights), enumerate(gaps), enumerate(accepts)
+    ):
+        table.append(
+            dict(
+                align_threshold=threshold,
+                sim_accept=accept,
+                alpha=alpha,
+                beta=beta,
+                gap=gap,
+                recall=recall[t] / total,
+                precision=precision[t] / total,
+                dtw_f1_bonus=bonus[w, g, a, f1] / total,
+                dtw_norm_score_bonus=bonus[w, g, a, norm] / total,
+                dtw_f1_gate=gate[g, a, f1] / total,
+                dtw_norm_score_gate=gate[g, a, norm] / total,
+            )
+        )
+    return table
+
+
+def format_table(table: List[Dict[str, float]]) -> str:
+    settings = ("align_threshold", "sim_accept", "alpha", "beta", "gap")
+    lines = [" ".join(f"{name:>15}" for name in settings + REPORT_COLUMNS)]
+    for entry in table:
+        lines.append(
+            " ".join(f"{entry[name]:>15.3f}" for name in settings)
+            + " "
+            + " ".join(f"{entry[name]:>15.4f}" for name in REPORT_COLUMNS)
+        )
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep ChainEval alignment thresholds over saved matrices.")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=DEFAULT_OUTPUT_PATH,
+        help="A .matrices.npz file or a directory of them (written with --save-matrices).",
+    )
+    parser.add_argument("--align-thresholds", type=float, nargs="+", default=[ALIGN_THRESHOLD])
+    parser.add_argument("--sim-accepts", type=float, nargs="+", default=[DTW_SIM_ACCEPT])
+    parser.add_argument("--alphas", type=float, nargs="+", default=[DTW_ALPHA_SIM])
+    parser.add_argument("--betas", type=float, nargs="+", default=[DTW_BETA_NUM])
+    parser.add_argument("--gap-penalties", type=float, nargs="+", default=[DTW_GAP_PENALTY])
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    total, rows = load_rows(resolve_matrix_files(args.input))
+    table = sweep(
+        total,
+        rows,
+        args.align_thresholds,
+        list(itertools.product(args.alphas, args.betas)),
+        args.gap_penalties,
+        args.sim_accepts,
+    )
+    print(f"rows: {total} ({len(rows)} with steps on both sides)")
+    print(format_table(table))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chaineval"))
+
+import aggregate  # noqa: E402
+
+
+def evals_row(index: int, seed: object) -> dict:
+    return dict(
+        seed=seed,
+        id=index % 50,
+        level="Easy",
+        topic="fintech",
+        subtopic="payments",
+        model="m",
+        final_answer_match=index % 2,
+        recall=0.5,
+        precision=0.25,
+        rouge2=0.1,
+        rougeL=0.2,
+        rougeLsum=0.3,
+        bertscore=0.9,
+    )
+
+
+def test_rows_table_keeps_schema_when_a_column_fills_in_after_the_first_batch(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    n_rows = aggregate.ROWS_BATCH + 8
+    evals = tmp_path / "model.jsonl"
+    with evals.open("w") as handle:
+        for index in range(n_rows):
+            seed = None if index < aggregate.ROWS_BATCH else f"seed-{index}"
+            handle.write(json.dumps(evals_row(index, seed)) + "\n")
+
+    rows_file = aggregate.rows_table_path(tmp_path, evals.name)
+    aggregate.aggregate_file(evals, aggregate.summary_path(tmp_path, evals.name), rows_file)
+
+    table = pq.read_table(rows_file)
+    assert table.schema == aggregate.row_table_schema()
+    assert table.num_rows == n_rows
+    seeds = table.column("seed").to_pylist()
+    assert seeds[: aggregate.ROWS_BATCH] == [None] * aggregate.ROWS_BATCH
+    assert seeds[aggregate.ROWS_BATCH :] == [f"seed-{index}" for index in range(aggregate.ROWS_BATCH, n_rows)]
+    assert table.column("final_answer_match").to_pylist()[:4] == [0, 1, 0, 1]
+    assert not rows_file.with_name(rows_file.name + ".tmp").exists()
+
+
+def test_failed_rows_table_leaves_no_partial_file(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    evals = tmp_path / "model.jsonl"
+    with evals.open("w") as handle:
+        for index in range(aggregate.ROWS_BATCH + 1):  # the first row group is already written
+            handle.write(json.dumps(evals_row(index, index)) + "\n")
+        handle.write("{torn\n")
+
+    rows_file = aggregate.rows_table_path(tmp_path, evals.name)
+    with pytest.raises(ValueError):
+        aggregate.aggregate_file(evals, aggregate.summary_path(tmp_path, evals.name), rows_file)
+    assert not rows_file.exists()
+    assert not rows_file.with_name(rows_file.name + ".tmp").exists()